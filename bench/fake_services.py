@@ -0,0 +1,213 @@
+"""Локальні підміни BscScan, BSC JSON-RPC і Telegram Bot API для бенчмарку.
+
+Синтетичний ланцюг: блок кожні block_time секунд, у кожному блоці пара
+(address, contract) має трансфер з імовірністю tx_prob. Трансфери
+детерміновані (хеш від пари й номера блоку), тож BscScan і RPC бачать
+однакову історію.
+"""
+import asyncio
+import hashlib
+import re
+import time
+
+from aiohttp import web
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+BASE_BLOCK = 1_000_000
+HISTORY_BLOCKS = 200
+DECIMALS = 18
+
+
+class FakeChain:
+    def __init__(self, pairs, block_time: float = 1.0, tx_prob: float = 0.05):
+        self.pairs = {(a.lower(), c.lower()) for a, c in pairs}
+        self.block_time = block_time
+        self.tx_prob = tx_prob
+        self.t0 = time.time()
+        self.block_of = {}  # hash -> блок, для всіх уже згенерованих трансферів
+
+    def head(self) -> int:
+        return BASE_BLOCK + int((time.time() - self.t0) / self.block_time)
+
+    def timestamp(self, block: int) -> float:
+        return self.t0 + (block - BASE_BLOCK) * self.block_time
+
+    def _digest(self, pair, block: int) -> bytes:
+        return hashlib.sha256(f"{pair[0]}:{pair[1]}:{block}".encode()).digest()
+
+    def transfer(self, pair, block: int) -> dict | None:
+        digest = self._digest(pair, block)
+        if int.from_bytes(digest[:4], "big") / 2 ** 32 >= self.tx_prob:
+            return None
+        # 1..1000 токенів
+        amount = 1 + int.from_bytes(digest[4:8], "big") % 1000
+        self.block_of["0x" + digest.hex()] = block
+        return {
+            "blockNumber": str(block),
+            "timeStamp": str(int(self.timestamp(block))),
+            "hash": "0x" + digest.hex(),
+            "from": pair[0],
+            "to": "0x" + digest[8:28].hex(),
+            "value": str(amount * 10 ** DECIMALS),
+            "contractAddress": pair[1],
+            "tokenName": "Bench Token",
+            "tokenSymbol": "BENCH",
+            "tokenDecimal": str(DECIMALS),
+        }
+
+    def transfers(self, pair, start: int, end: int) -> list:
+        start = max(start, BASE_BLOCK - HISTORY_BLOCKS)
+        return [tx for tx in (self.transfer(pair, b) for b in range(start, end + 1)) if tx]
+
+
+class _RateLimiter:
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._second = 0
+        self._count = 0
+
+    def allow(self) -> bool:
+        if self.per_second <= 0:
+            return True
+        second = int(time.monotonic())
+        if second != self._second:
+            self._second, self._count = second, 0
+        self._count += 1
+        return self._count <= self.per_second
+
+
+class FakeServices:
+    """Один aiohttp-сервер з трьома API:
+
+    GET  /api             — BscScan tokentx
+    POST /rpc             — JSON-RPC (eth_blockNumber, eth_getLogs, eth_call)
+    POST /bot<token>/<m>  — Telegram Bot API (getMe, sendMessage, ...)
+    """
+
+    def __init__(self, chain: FakeChain, latency: float = 0.05, rate_limit: float = 5):
+        self.chain = chain
+        self.latency = latency
+        self._limiter = _RateLimiter(rate_limit)
+        self.api_calls = 0
+        self.rpc_calls = 0
+        self.rate_limited = 0
+        self.messages = []  # (час отримання, текст)
+        self._runner = None
+        self.port = None
+
+    # ── BscScan ──
+    async def _bscscan(self, request: web.Request):
+        self.api_calls += 1
+        await asyncio.sleep(self.latency)
+        if not self._limiter.allow():
+            self.rate_limited += 1
+            return web.json_response({"status": "0", "message": "NOTOK", "result": "Max rate limit reached"})
+
+        q = request.query
+        pair = (q.get("address", "").lower(), q.get("contractaddress", "").lower())
+        if pair not in self.chain.pairs:
+            return web.json_response({"status": "0", "message": "No transactions found", "result": []})
+        txs = self.chain.transfers(pair, int(q.get("startblock", 0)), self.chain.head())
+        if q.get("sort") == "desc":
+            txs.reverse()
+        offset = int(q.get("offset", 10000))
+        page = int(q.get("page", 1))
+        txs = txs[(page - 1) * offset:page * offset]
+        if not txs:
+            return web.json_response({"status": "0", "message": "No transactions found", "result": []})
+        return web.json_response({"status": "1", "message": "OK", "result": txs})
+
+    # ── JSON-RPC ──
+    def _logs(self, params: dict) -> list:
+        contracts = params.get("address") or []
+        contracts = {c.lower() for c in ([contracts] if isinstance(contracts, str) else contracts)}
+        topics = params.get("topics") or []
+        senders = topics[1] if len(topics) > 1 and topics[1] else []
+        senders = {"0x" + s[-40:].lower() for s in ([senders] if isinstance(senders, str) else senders)}
+        start, end = int(params["fromBlock"], 16), int(params["toBlock"], 16)
+
+        logs = []
+        for pair in self.chain.pairs:
+            if pair[1] not in contracts or (senders and pair[0] not in senders):
+                continue
+            for tx in self.chain.transfers(pair, start, end):
+                logs.append({
+                    "address": pair[1],
+                    "topics": [TRANSFER_TOPIC, "0x" + pair[0][2:].rjust(64, "0"), "0x" + tx["to"][2:].rjust(64, "0")],
+                    "data": hex(int(tx["value"])),
+                    "blockNumber": hex(int(tx["blockNumber"])),
+                    "transactionHash": tx["hash"],
+                    "logIndex": "0x0",
+                    "removed": False,
+                })
+        return logs
+
+    async def _rpc(self, request: web.Request):
+        self.rpc_calls += 1
+        await asyncio.sleep(self.latency)
+        body = await request.json()
+        method, params = body.get("method"), body.get("params", [])
+        if method == "eth_blockNumber":
+            result = hex(self.chain.head())
+        elif method == "eth_getLogs":
+            result = self._logs(params[0])
+        elif method == "eth_call":
+            selector = params[0].get("data", "")[:10]
+            if selector == "0x313ce567":
+                result = "0x" + hex(DECIMALS)[2:].rjust(64, "0")
+            else:
+                text = b"BENCH"
+                result = "0x" + (32).to_bytes(32, "big").hex() + len(text).to_bytes(32, "big").hex() + text.ljust(32, b"\0").hex()
+        else:
+            return web.json_response({"jsonrpc": "2.0", "id": body.get("id"), "error": {"code": -32601, "message": method}})
+        return web.json_response({"jsonrpc": "2.0", "id": body.get("id"), "result": result})
+
+    # ── Telegram ──
+    async def _telegram(self, request: web.Request):
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        elif method == "sendMessage":
+            self.messages.append((time.time(), data.get("text", "")))
+            result = {
+                "message_id": len(self.messages),
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 0)), "type": "channel"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        app = web.Application()
+        app.router.add_get("/api", self._bscscan)
+        app.router.add_post("/rpc", self._rpc)
+        app.router.add_post(r"/bot{token}/{method}", self._telegram)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def alert_latencies(self, since: float = 0.0) -> list:
+        """Затримки (с) від блоку трансферу до отримання sendMessage."""
+        latencies = []
+        for received, text in self.messages:
+            for tx_hash in re.findall(r"/tx/(0x[0-9a-f]{64})", text):
+                block = self.chain.block_of.get(tx_hash)
+                if block is None:
+                    continue
+                sent_at = self.chain.timestamp(block)
+                if sent_at >= since:
+                    latencies.append(received - sent_at)
+        return latencies
@@ -0,0 +1,242 @@
+"""Бенчмарк і навантажувальний тест планувальника та хендлерів.
+
+    python -m bench.run --users 2000 --tokens-per-wallet 5 --out bench.json
+
+Піднімає локальні BscScan / JSON-RPC / Telegram (bench.fake_services),
+заповнює тимчасову базу синтетичними підписками і міряє:
+час запису підписок і читання меню, тривалість циклу check_wallets і
+кількість запитів до API за цикл, затримку сповіщень (блок трансферу →
+sendMessage) під start_scheduler, а також пікову пам'ять. Результат —
+JSON, щоб регресії можна було відстежувати автоматично.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--users", type=int, default=500)
+    p.add_argument("--wallets-per-user", type=int, default=2)
+    p.add_argument("--tokens-per-wallet", type=int, default=2)
+    p.add_argument("--shared-ratio", type=float, default=0.3,
+                   help="частка підписок на спільні «популярні» пари")
+    p.add_argument("--popular-pairs", type=int, default=20)
+    p.add_argument("--latency-ms", type=float, default=50, help="затримка відповіді API")
+    p.add_argument("--rate-limit", type=float, default=0, help="запитів/с до BscScan (0 — без ліміту)")
+    p.add_argument("--block-time", type=float, default=1.0)
+    p.add_argument("--tx-prob", type=float, default=0.05, help="імовірність трансферу пари в блоці")
+    p.add_argument("--cycles", type=int, default=3, help="скільки циклів check_wallets міряти")
+    p.add_argument("--duration", type=float, default=20, help="скільки секунд ганяти start_scheduler")
+    p.add_argument("--source", choices=["bscscan", "rpc"], default="bscscan")
+    p.add_argument("--out", help="куди записати JSON (за замовчуванням stdout)")
+    return p.parse_args(argv)
+
+
+def _configure_env(args, data_dir: str):
+    """Налаштування модулів читаються при імпорті, тож виставляємо їх заздалегідь."""
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["INGESTION_SOURCE"] = args.source
+    os.environ["RPC_CONFIRMATIONS"] = "0"
+    os.environ["RPC_POLL_INTERVAL"] = str(args.block_time)
+    os.environ.setdefault("BSCSCAN_RPS", str(args.rate_limit or 1000))
+    os.environ.setdefault("BSCSCAN_MAX_CONCURRENCY", "50")
+    os.environ.setdefault("HTTP_POOL_LIMIT", "100")
+    os.environ.setdefault("POLL_MIN_INTERVAL", str(args.block_time))
+    os.environ.setdefault("TG_CHAT_INTERVAL", "0")
+    os.environ.setdefault("TG_GLOBAL_RPS", "1000")
+    os.environ.setdefault("TG_COALESCE_DELAY", "0.1")
+    os.environ.setdefault("STATE_BACKEND", "memory")
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "max": values[-1],
+    }
+
+
+def _address(prefix: str, n: int) -> str:
+    return "0x" + prefix + format(n, "x").rjust(40 - len(prefix), "0")
+
+
+def _seed(args, data_manager) -> tuple[list, dict]:
+    """Заповнює базу; повертає пари і таймінги записів."""
+    pairs = set()
+    timings = []
+    popular = [(_address("aa", i), _address("cc", i)) for i in range(args.popular_pairs)]
+    counter = 0
+    for u in range(args.users):
+        user_id = str(100000 + u)
+        for w in range(args.wallets_per_user):
+            counter += 1
+            shared = (counter % 100) < args.shared_ratio * 100
+            address = popular[counter % len(popular)][0] if shared else _address("a1", counter)
+            name = f"w{w}"
+            started = time.perf_counter()
+            data_manager.add_wallet(user_id, name, address)
+            timings.append(time.perf_counter() - started)
+            for t in range(args.tokens_per_wallet):
+                contract = popular[counter % len(popular)][1] if shared else _address("c1", t)
+                started = time.perf_counter()
+                data_manager.add_token(user_id, name, contract, f"T{t}", "0", "1000000")
+                timings.append(time.perf_counter() - started)
+                pairs.add((address.lower(), contract.lower()))
+    return sorted(pairs), {"writes": _percentiles(timings), "write_seconds_total": sum(timings)}
+
+
+async def _bench_handlers(args, data_manager) -> dict:
+    """Меню користувача через справжні хендлери з підставними Update."""
+    from handlers import token_handler, wallet_handler
+
+    async def reply_text(*_, **__):
+        return None
+
+    sample = [str(100000 + u) for u in range(0, args.users, max(1, args.users // 200))]
+    results = {}
+    for name, handler in (
+        ("show_user_data", token_handler.show_user_data),
+        ("prompt_wallet_removal", wallet_handler.prompt_wallet_removal),
+        ("prompt_token_removal", token_handler.prompt_token_removal),
+    ):
+        timings = []
+        for user_id in sample:
+            update = SimpleNamespace(
+                effective_user=SimpleNamespace(id=int(user_id)),
+                callback_query=SimpleNamespace(message=SimpleNamespace(reply_text=reply_text)),
+            )
+            started = time.perf_counter()
+            await handler(update, None)
+            timings.append(time.perf_counter() - started)
+        results[name] = _percentiles(timings)
+
+    timings = []
+    for user_id in sample:
+        started = time.perf_counter()
+        data_manager.get_user(user_id)
+        timings.append(time.perf_counter() - started)
+    results["get_user"] = _percentiles(timings)
+    return results
+
+
+async def _run(args) -> dict:
+    from bench.fake_services import FakeChain, FakeServices
+
+    data_dir = tempfile.mkdtemp(prefix="alert-bot-bench-")
+    _configure_env(args, data_dir)
+
+    # Порт потрібен до імпорту модулів бота, тож сервер стартує першим
+    chain = FakeChain([], block_time=args.block_time, tx_prob=args.tx_prob)
+    services = FakeServices(chain, latency=args.latency_ms / 1000, rate_limit=args.rate_limit)
+    port = await services.start()
+    base = f"http://127.0.0.1:{port}"
+    os.environ["BSCSCAN_API_URL"] = f"{base}/api"
+    os.environ["BSC_RPC_URL"] = f"{base}/rpc"
+
+    import data_manager
+    from telegram import Bot
+    from utils import scheduler
+    from utils.http_client import start_http, close_http
+    from utils.notifier import start_notifier, stop_notifier
+
+    started = time.perf_counter()
+    pairs, storage = _seed(args, data_manager)
+    storage["seed_seconds"] = time.perf_counter() - started
+    chain.pairs = set(pairs)
+
+    started = time.perf_counter()
+    data_manager.load_data()
+    storage["load_data_seconds"] = time.perf_counter() - started
+    storage["db_bytes"] = sum(
+        os.path.getsize(os.path.join(data_dir, f)) for f in os.listdir(data_dir)
+    )
+
+    report = {
+        "params": vars(args),
+        "subscriptions": args.users * args.wallets_per_user * args.tokens_per_wallet,
+        "unique_pairs": len(pairs),
+        "storage": storage,
+        "handlers": await _bench_handlers(args, data_manager),
+    }
+
+    bot = Bot("0:bench", base_url=f"{base}/bot")
+    async with bot:
+        await start_http()
+        notifier = start_notifier(bot)
+        try:
+            # Перший цикл — прогрів: курсори і seen для історії
+            cycles = []
+            for i in range(args.cycles + 1):
+                calls = services.api_calls + services.rpc_calls
+                started = time.perf_counter()
+                await scheduler.check_wallets(None)
+                elapsed = time.perf_counter() - started
+                if i:
+                    cycles.append({
+                        "seconds": elapsed,
+                        "api_calls": services.api_calls + services.rpc_calls - calls,
+                    })
+                await asyncio.sleep(args.block_time)
+            report["check_wallets"] = {
+                "cycles": cycles,
+                "cycle_seconds": _percentiles([c["seconds"] for c in cycles]),
+                "api_calls_per_cycle": statistics.fmean(c["api_calls"] for c in cycles) if cycles else 0,
+            }
+
+            since = time.time()
+            calls = services.api_calls + services.rpc_calls
+            task = asyncio.create_task(scheduler.start_scheduler(None))
+            await asyncio.sleep(args.duration)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            # Дочікуємось доставки черги, щоб затримки врахували всі сповіщення
+            await stop_notifier()
+            report["start_scheduler"] = {
+                "seconds": args.duration,
+                "api_calls": services.api_calls + services.rpc_calls - calls,
+                "alert_latency_seconds": _percentiles(services.alert_latencies(since)),
+            }
+        finally:
+            await stop_notifier()
+            await close_http()
+
+    report["api"] = {
+        "bscscan_calls": services.api_calls,
+        "rpc_calls": services.rpc_calls,
+        "rate_limited": services.rate_limited,
+        "telegram_messages": len(services.messages),
+        "alerts_dropped": notifier.dropped,
+    }
+    # ru_maxrss — КБ на Linux
+    report["memory"] = {"max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    await services.stop()
+    return report
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    report = asyncio.run(_run(args))
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
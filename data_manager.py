@@ -1,37 +1,656 @@
 from pathlib import Path
+from contextlib import contextmanager
+import atexit
 import json
-from filelock import FileLock
-import sys
+import logging
+import os
+import sqlite3
+import time
+
+from utils.metrics import Counter, Gauge, Histogram
+from utils.seen_set import SeenSet
 
 # ──────────────────────────────────────
 # Використовуємо монтування Render Persistent Disk
-BASE_DIR  = Path("/data")             # сюди Render змонтував Persistent Disk
+BASE_DIR  = Path(os.getenv("DATA_DIR", "/data"))  # сюди Render змонтував Persistent Disk
 BASE_DIR.mkdir(exist_ok=True)           # створити папку, якщо ще не створена
-DATA_FILE = BASE_DIR / "data.json"
-LOCK_FILE = BASE_DIR / "data.lock"
+DB_FILE   = BASE_DIR / "data.db"
+# Старі JSON-файли — імпортуються один раз при створенні бази
+DATA_FILE    = BASE_DIR / "data.json"
+CURSORS_FILE = BASE_DIR / "cursors.json"
 # ──────────────────────────────────────
 
-def load_data() -> dict:
-    print("[DEBUG] load_data() ->", DATA_FILE, file=sys.stderr)
-    with FileLock(str(LOCK_FILE)):
-        if not DATA_FILE.exists():
-            print("[DEBUG] data.json не знайдено, повертаю {}", file=sys.stderr)
-            return {}
+SCHEMA_VERSION = 6
+# Скільки останніх хешів транзакцій пам'ятаємо на користувача
+SEEN_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS wallets (
+    id      INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    name    TEXT NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS wallets_user ON wallets(user_id);
+CREATE TABLE IF NOT EXISTS tokens (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    wallet_name TEXT NOT NULL,
+    contract    TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    min         TEXT NOT NULL,
+    max         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_user ON tokens(user_id);
+CREATE TABLE IF NOT EXISTS seen_sets (
+    user_id TEXT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    hashes  BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    address  TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    block    INTEGER NOT NULL,
+    hash     TEXT,
+    PRIMARY KEY (address, contract)
+);
+CREATE TABLE IF NOT EXISTS token_meta (
+    contract   TEXT PRIMARY KEY,
+    symbol     TEXT,
+    name       TEXT,
+    decimals   INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    address   TEXT NOT NULL,
+    contract  TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    expires   REAL NOT NULL,
+    PRIMARY KEY (address, contract)
+);
+CREATE TABLE IF NOT EXISTS conv_state (
+    user_id TEXT PRIMARY KEY,
+    state   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id    INTEGER NOT NULL,
+    contract   TEXT NOT NULL,
+    token_name TEXT NOT NULL,
+    tx_hash    TEXT NOT NULL,
+    quantity   REAL NOT NULL,
+    owner      TEXT NOT NULL,
+    expires    REAL NOT NULL,
+    PRIMARY KEY (chat_id, contract, token_name, tx_hash)
+);
+"""
+
+log = logging.getLogger(__name__)
+
+# BEGIN IMMEDIATE чекає, поки інший процес (webhook/воркер) відпустить запис
+DB_LOCK_WAIT   = Histogram("db_lock_wait_seconds", "Очікування блокування запису SQLite")
+DB_TX_SECONDS  = Histogram("db_transaction_seconds", "Тривалість транзакцій запису")
+DB_TX_ERRORS   = Counter("db_transaction_errors_total", "Транзакції, відкочені через помилку")
+
+_conn = None
+
+def _db() -> sqlite3.Connection:
+    """Одне з'єднання на процес; WAL дозволяє читати паралельно з записом."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(str(DB_FILE), timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _migrate(conn)
+        _conn = conn
+    return _conn
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # BEGIN IMMEDIATE серіалізує міграцію між процесами (webhook + воркери)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if 1 <= version < 2:
+            _migrate_seen_v2(conn)
+        # Усі таблиці — IF NOT EXISTS, тож нові версії просто додають свої
+        # executescript() робить COMMIT, тож виконуємо інструкції по одній
+        for statement in _SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        if version < 1:
+            _import_json(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _import_json(conn: sqlite3.Connection) -> None:
+    """Одноразовий перенос даних із data.json / cursors.json."""
+    if DATA_FILE.exists():
         with open(DATA_FILE, "r", encoding="utf-8") as f:
-            d = json.load(f)
-        print(f"[DEBUG] load_data прочитано {len(d)} користувачів", file=sys.stderr)
-        return d
+            data = json.load(f)
+        _write_all(conn, data)
+        log.info("Імпортовано %d користувачів з %s", len(data), DATA_FILE)
+    if CURSORS_FILE.exists():
+        with open(CURSORS_FILE, "r", encoding="utf-8") as f:
+            _write_cursors(conn, json.load(f))
+
+def _migrate_seen_v2(conn: sqlite3.Connection) -> None:
+    """v1 → v2: рядок на кожен hex-хеш замінено одним BLOB сирих хешів на користувача."""
+    conn.execute(
+        "CREATE TABLE seen_sets (user_id TEXT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,"
+        " hashes BLOB NOT NULL)"
+    )
+    by_user = {}
+    for row in conn.execute("SELECT user_id, tx_hash FROM seen ORDER BY id"):
+        by_user.setdefault(row["user_id"], []).append(row["tx_hash"])
+    for user_id, hashes in by_user.items():
+        _write_seen(conn, user_id, _seen_from_hex(hashes))
+    conn.execute("DROP TABLE seen")
 
-def save_data(data: dict) -> None:
-    print("[DEBUG] save_data() викликано. Спроба записати", file=sys.stderr)
+@contextmanager
+def transaction():
+    """Атомарний запис: або всі зміни, або жодної."""
+    conn = _db()
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    locked = time.perf_counter()
+    DB_LOCK_WAIT.observe(locked - started)
     try:
-        with FileLock(str(LOCK_FILE)):
-            tmp = DATA_FILE.with_suffix(".tmp")
-            print(f"[DEBUG] Записую у тимчасовий файл {tmp}", file=sys.stderr)
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            tmp.replace(DATA_FILE)
-            print(f"[DEBUG] Замінив {tmp} → {DATA_FILE}", file=sys.stderr)
-    except Exception as e:
-        print("[ERROR] save_data failed:", e, file=sys.stderr)
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        DB_TX_ERRORS.inc()
         raise
+    conn.execute("COMMIT")
+    DB_TX_SECONDS.observe(time.perf_counter() - locked)
+
+def _ensure_user(conn: sqlite3.Connection, user_id: str) -> None:
+    conn.execute("INSERT OR IGNORE INTO users(user_id) VALUES (?)", (user_id,))
+
+def _bump_generation(conn: sqlite3.Connection) -> int:
+    conn.execute(
+        "INSERT INTO meta(key, value) VALUES ('subs_generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+    return conn.execute("SELECT value FROM meta WHERE key = 'subs_generation'").fetchone()["value"]
+
+def subscriptions_generation() -> int:
+    """Лічильник змін гаманців/токенів — дешевий спосіб для інших процесів помітити зміни."""
+    row = _db().execute("SELECT value FROM meta WHERE key = 'subs_generation'").fetchone()
+    return row["value"] if row else 0
+
+def subscriptions_changed(since: int | None) -> tuple:
+    """(поточний лічильник, чи були після since зміни, яких не бачили слухачі on_change).
+
+    Зміни цього ж процесу через add_*/remove_* вже застосовані слухачами
+    інкрементально — повна перебудова потрібна лише для чужих записів.
+    """
+    current = subscriptions_generation()
+    if since is None or current < since:
+        foreign = True
+    else:
+        foreign = any(g not in _own_generations for g in range(since + 1, current + 1))
+    _own_generations.difference_update([g for g in _own_generations if g <= current])
+    return current, foreign
+
+# ── Читання ──────────────────────────
+
+def _wallet(row) -> dict:
+    return {"name": row["name"], "address": row["address"]}
+
+def _token(row) -> dict:
+    return {
+        "wallet_name": row["wallet_name"],
+        "contract": row["contract"],
+        "name": row["name"],
+        "min": row["min"],
+        "max": row["max"],
+    }
+
+# ── Кеш користувачів ─────────────────
+# Меню (show_user_data, prompt_wallet_removal тощо) читають одного користувача
+# з пам'яті. Власні записи скидають його запис одразу; чужі (інші процеси)
+# помічаємо через PRAGMA data_version, а лічильник subs_generation відрізняє
+# зміни підписок від, напр., запису seen планувальником.
+
+_user_cache = {}
+_cache_generation = None
+_data_version = None
+
+def _check_cache() -> None:
+    global _cache_generation, _data_version
+    version = _db().execute("PRAGMA data_version").fetchone()[0]
+    if version == _data_version:
+        return
+    _data_version = version
+    generation = subscriptions_generation()
+    if generation != _cache_generation:
+        _user_cache.clear()
+        _cache_generation = generation
+
+def _invalidate(user_id: str | None = None) -> None:
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(user_id, None)
+
+def get_user(user_id) -> dict:
+    """Гаманці й токени одного користувача (з кешу; результат не змінювати)."""
+    user_id = str(user_id)
+    _check_cache()
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = _user_cache[user_id] = _read_user(user_id)
+    return user
+
+def _read_user(user_id: str) -> dict:
+    conn = _db()
+    wallets = conn.execute(
+        "SELECT name, address FROM wallets WHERE user_id = ? ORDER BY id", (user_id,)
+    ).fetchall()
+    tokens = conn.execute(
+        "SELECT wallet_name, contract, name, min, max FROM tokens WHERE user_id = ? ORDER BY id",
+        (user_id,),
+    ).fetchall()
+    return {"wallets": [_wallet(r) for r in wallets], "tokens": [_token(r) for r in tokens]}
+
+def load_data() -> dict:
+    """Повний знімок {user_id: {"wallets", "tokens"}} (seen читається окремо — load_seen)."""
+    conn = _db()
+    data = {row["user_id"]: {"wallets": [], "tokens": []}
+            for row in conn.execute("SELECT user_id FROM users")}
+    for row in conn.execute("SELECT user_id, name, address FROM wallets ORDER BY id"):
+        data[row["user_id"]]["wallets"].append(_wallet(row))
+    for row in conn.execute("SELECT user_id, wallet_name, contract, name, min, max FROM tokens ORDER BY id"):
+        data[row["user_id"]]["tokens"].append(_token(row))
+    return data
+
+def _seen_from_hex(hashes) -> SeenSet:
+    seen = SeenSet(SEEN_LIMIT)
+    for h in hashes:
+        try:
+            seen.add(h)
+        except ValueError:
+            log.warning("Пропускаю некоректний хеш у seen: %r", h)
+    return seen
+
+def _read_seen(conn: sqlite3.Connection, user_id: str) -> SeenSet:
+    row = conn.execute("SELECT hashes FROM seen_sets WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return SeenSet(SEEN_LIMIT)
+    return SeenSet.from_bytes(row["hashes"], SEEN_LIMIT)
+
+def load_seen(user_id) -> SeenSet:
+    user_id = str(user_id)
+    seen = _read_seen(_db(), user_id)
+    # Ще не записані хеші (див. flush) теж вважаються побаченими
+    pending = _pending_seen.get(user_id)
+    if pending:
+        seen.update(pending)
+    return seen
+
+def load_cursors() -> dict:
+    cursors = {
+        f"{row['address']}:{row['contract']}": {"block": row["block"], "hash": row["hash"]}
+        for row in _db().execute("SELECT address, contract, block, hash FROM cursors")
+    }
+    for (address, contract), cursor in _pending_cursors.items():
+        cursors[f"{address}:{contract}"] = dict(cursor)
+    return cursors
+
+def get_token_meta(contract: str) -> dict | None:
+    row = _db().execute(
+        "SELECT contract, symbol, name, decimals, fetched_at FROM token_meta WHERE contract = ?",
+        (contract.lower(),),
+    ).fetchone()
+    return dict(row) if row else None
+
+def put_token_meta(contract: str, symbol: str | None, name: str | None, decimals: int, fetched_at: float) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO token_meta(contract, symbol, name, decimals, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (contract.lower(), symbol, name, decimals, fetched_at),
+        )
+
+# ── Слухачі змін підписок ─────────────
+# Викликаються з user_id після кожної зміни гаманців/токенів у цьому процесі
+# (напр. планувальник інкрементально оновлює індекс підписок).
+
+_listeners = []
+# Значення subs_generation, які цей процес записав сам і вже передав слухачам
+_own_generations = set()
+
+def on_change(callback) -> None:
+    _listeners.append(callback)
+
+def _changed(user_id: str, generation: int) -> None:
+    _invalidate(user_id)
+    # Без слухачів (webhook-процес без планувальника) ці значення ніхто не читає
+    if _listeners:
+        _own_generations.add(generation)
+    for callback in _listeners:
+        try:
+            callback(user_id)
+        except Exception as e:
+            log.exception("listener %r failed for user=%s: %s", callback, user_id, e)
+
+# ── Запис окремих записів ─────────────
+
+def add_wallet(user_id, name: str, address: str) -> None:
+    user_id = str(user_id)
+    with transaction() as conn:
+        _ensure_user(conn, user_id)
+        conn.execute(
+            "INSERT INTO wallets(user_id, name, address) VALUES (?, ?, ?)", (user_id, name, address)
+        )
+        generation = _bump_generation(conn)
+    _changed(user_id, generation)
+
+def remove_wallet(user_id, name: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM wallets WHERE user_id = ? AND name = ?", (str(user_id), name))
+        generation = _bump_generation(conn)
+    _changed(str(user_id), generation)
+
+def add_token(user_id, wallet_name: str, contract: str, name: str, min_value: str, max_value: str) -> None:
+    user_id = str(user_id)
+    with transaction() as conn:
+        _ensure_user(conn, user_id)
+        conn.execute(
+            "INSERT INTO tokens(user_id, wallet_name, contract, name, min, max) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, wallet_name, contract, name, min_value, max_value),
+        )
+        generation = _bump_generation(conn)
+    _changed(user_id, generation)
+
+def remove_token(user_id, name: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM tokens WHERE user_id = ? AND name = ?", (str(user_id), name))
+        generation = _bump_generation(conn)
+    _changed(str(user_id), generation)
+
+# ── Дельти планувальника ──────────────
+# Планувальник пише лише те, що сам змінив, тож зміни від хендлерів,
+# зроблені під час довгого циклу, не перезаписуються застарілим знімком.
+
+def _write_seen(conn: sqlite3.Connection, user_id: str, seen: SeenSet) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO seen_sets(user_id, hashes) VALUES (?, ?)", (user_id, seen.to_bytes())
+    )
+
+def record_seen(user_id, hashes) -> None:
+    """Додає хеші до seen користувача; найстаріші понад SEEN_LIMIT витісняються.
+
+    Запис відкладений: див. flush().
+    """
+    hashes = list(hashes)
+    if not hashes:
+        return
+    _pending_seen.setdefault(str(user_id), []).extend(hashes)
+    _mark_dirty(len(hashes))
+
+def set_cursor(address: str, contract: str, cursor: dict) -> None:
+    """Запам'ятовує курсор пари; запис відкладений, див. flush()."""
+    _pending_cursors[(address, contract)] = dict(cursor)
+    _mark_dirty(1)
+
+def prune_cursors(active_keys) -> None:
+    """Видаляє курсори пар, на які більше ніхто не підписаний."""
+    active_keys = set(active_keys)
+    for address, contract in list(_pending_cursors):
+        if f"{address}:{contract}" not in active_keys:
+            del _pending_cursors[(address, contract)]
+    stale = [
+        (row["address"], row["contract"])
+        for row in _db().execute("SELECT address, contract FROM cursors")
+        if f"{row['address']}:{row['contract']}" not in active_keys
+    ]
+    if not stale:
+        return
+    with transaction() as conn:
+        conn.executemany("DELETE FROM cursors WHERE address = ? AND contract = ?", stale)
+
+# ── Відкладений запис seen, курсорів і черги сповіщень ─
+# Планувальник змінює seen і курсори на кожному опитуванні. Зміни збираються
+# в пам'яті й пишуться однією транзакцією не частіше ніж раз на FLUSH_DELAY
+# секунд (flush_if_due() з циклу планувальника, flush() при зупинці). Разом з
+# ними пишеться і черга ще не доставлених сповіщень (outbox), тож після збою
+# seen, курсори й черга відкочуються до того самого моменту: трансфери
+# останніх секунд буде знайдено й поставлено в чергу ще раз.
+# Журнал змін — це WAL SQLite; compact() періодично переносить його в основний
+# файл і обрізає.
+
+FLUSH_DELAY       = float(os.getenv("DB_FLUSH_DELAY", "2"))      # 0 — писати одразу
+FLUSH_MAX_PENDING = int(os.getenv("DB_FLUSH_MAX_PENDING", "5000"))
+COMPACT_INTERVAL  = float(os.getenv("DB_COMPACT_INTERVAL", "3600"))
+
+_pending_seen = {}     # user_id -> [tx_hash, ...]
+_pending_cursors = {}  # (address, contract) -> cursor
+_pending_outbox = {}   # (chat_id, contract, token_name, tx_hash) -> (quantity, owner, lease)
+_pending_done = set()  # ключі outbox, уже доставлені
+_pending_count = 0
+_dirty_since = None
+_next_compact = time.monotonic() + COMPACT_INTERVAL
+
+DB_BUFFERED = Counter("db_buffered_writes_total", "Зміни seen/курсорів, прийняті у відкладений запис")
+DB_FLUSHES  = Counter("db_flushes_total", "Транзакції, що записали накопичені зміни")
+DB_PENDING  = Gauge("db_pending_writes", "Зміни, що чекають запису", func=lambda: _pending_count)
+
+def _mark_dirty(count: int) -> None:
+    global _pending_count, _dirty_since
+    _pending_count += count
+    DB_BUFFERED.inc(count)
+    if _dirty_since is None:
+        _dirty_since = time.monotonic()
+    if FLUSH_DELAY <= 0 or _pending_count >= FLUSH_MAX_PENDING:
+        flush()
+
+def flush() -> None:
+    """Пише накопичені seen, курсори й outbox однією транзакцією; без змін — нічого не робить."""
+    global _pending_seen, _pending_cursors, _pending_outbox, _pending_done, _pending_count, _dirty_since
+    if not _pending_count:
+        return
+    now = time.time()
+    with transaction() as conn:
+        for user_id, hashes in _pending_seen.items():
+            _ensure_user(conn, user_id)
+            seen = _read_seen(conn, user_id)
+            seen.update(hashes)
+            _write_seen(conn, user_id, seen)
+        conn.executemany(
+            "INSERT OR REPLACE INTO cursors(address, contract, block, hash) VALUES (?, ?, ?, ?)",
+            [(address, contract, cursor["block"], cursor.get("hash"))
+             for (address, contract), cursor in _pending_cursors.items()],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO outbox(chat_id, contract, token_name, tx_hash, quantity, owner, expires) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*key, quantity, owner, now + lease) for key, (quantity, owner, lease) in _pending_outbox.items()],
+        )
+        conn.executemany(
+            "DELETE FROM outbox WHERE chat_id = ? AND contract = ? AND token_name = ? AND tx_hash = ?",
+            _pending_done,
+        )
+    # Якщо транзакція впала, буфер лишається і піде в наступну спробу
+    _pending_seen, _pending_cursors, _pending_outbox, _pending_done = {}, {}, {}, set()
+    _pending_count, _dirty_since = 0, None
+    DB_FLUSHES.inc()
+
+def flush_if_due() -> None:
+    """Викликається з циклу планувальника: запис після FLUSH_DELAY і періодичне compact()."""
+    now = time.monotonic()
+    if _dirty_since is not None and now - _dirty_since >= FLUSH_DELAY:
+        flush()
+    if now >= _next_compact:
+        compact()
+
+def compact() -> None:
+    """Переносить WAL в основний файл бази і обрізає його до нуля."""
+    global _next_compact
+    _next_compact = time.monotonic() + COMPACT_INTERVAL
+    flush()
+    busy, log_pages, moved = _db().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    if busy:
+        # Хтось читає старий знімок — обріжемо наступного разу
+        log.debug("wal_checkpoint: busy, перенесено %s з %s сторінок", moved, log_pages)
+
+# Підстраховка на випадок виходу без flush() у shutdown
+atexit.register(flush)
+
+# ── Черга сповіщень (outbox) ──────────
+# Сповіщення живе тут від постановки в чергу до доставки. Рядки орендує
+# процес, що їх надсилає (owner, expires); рядки процесу, що впав або
+# зупинився, не дочекавшись доставки, після спливу оренди забирає інший.
+
+def outbox_add(owner: str, chat_id: int, contract: str, token_name: str, tx_hash: str,
+               quantity: float, lease: float) -> None:
+    key = (chat_id, contract, token_name, tx_hash)
+    _pending_outbox[key] = (quantity, owner, lease)
+    _pending_done.discard(key)
+    _mark_dirty(1)
+
+def outbox_done(keys) -> None:
+    """Позначає сповіщення доставленими; ще не записані просто зникають з буфера."""
+    count = 0
+    for key in keys:
+        if _pending_outbox.pop(key, None) is None:
+            _pending_done.add(key)
+            count += 1
+    if count:
+        _mark_dirty(count)
+
+def renew_outbox(owner: str, lease: float) -> None:
+    with transaction() as conn:
+        conn.execute("UPDATE outbox SET expires = ? WHERE owner = ?", (time.time() + lease, owner))
+
+def claim_outbox(owner: str, lease: float, own: bool = False) -> list:
+    """Забирає чужі рядки з простроченою орендою; own=True — ще й усі свої
+    (при старті, якщо процес перезапустився з тим самим id).
+
+    Повертає забрані рядки: dict(chat_id, contract, token_name, tx_hash, quantity).
+    """
+    now = time.time()
+    with transaction() as conn:
+        rows = conn.execute(
+            "SELECT chat_id, contract, token_name, tx_hash, quantity FROM outbox "
+            "WHERE (owner != ? AND expires < ?) OR (? AND owner = ?)",
+            (owner, now, own, owner),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET owner = ?, expires = ? "
+            "WHERE chat_id = ? AND contract = ? AND token_name = ? AND tx_hash = ?",
+            [(owner, now + lease, row["chat_id"], row["contract"], row["token_name"], row["tx_hash"])
+             for row in rows],
+        )
+    return [dict(row) for row in rows]
+
+# ── Воркери і оренда пар ──────────────
+# Кілька воркерів планувальника ділять пари через consistent hashing; оренда в
+# базі гарантує, що пару в кожен момент опитує лише один з них.
+
+def heartbeat_worker(worker_id: str, ttl: float) -> list:
+    """Оновлює серцебиття воркера, прибирає мертвих; повертає живих, відсортованих."""
+    now = time.time()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO workers(worker_id, heartbeat) VALUES (?, ?)", (worker_id, now)
+        )
+        conn.execute("DELETE FROM workers WHERE heartbeat < ?", (now - ttl,))
+        return [row["worker_id"] for row in conn.execute("SELECT worker_id FROM workers ORDER BY worker_id")]
+
+def remove_worker(worker_id: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+        conn.execute("DELETE FROM leases WHERE worker_id = ?", (worker_id,))
+
+def acquire_leases(worker_id: str, pairs, ttl: float) -> set:
+    """Бере або продовжує оренду пар; повертає ті, що тепер належать воркеру."""
+    now = time.time()
+    acquired = set()
+    with transaction() as conn:
+        for address, contract in pairs:
+            cur = conn.execute(
+                "INSERT INTO leases(address, contract, worker_id, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(address, contract) DO UPDATE SET worker_id = excluded.worker_id, "
+                "expires = excluded.expires WHERE leases.worker_id = excluded.worker_id OR leases.expires < ?",
+                (address, contract, worker_id, now + ttl, now),
+            )
+            if cur.rowcount:
+                acquired.add((address, contract))
+    return acquired
+
+def release_leases(worker_id: str, pairs) -> None:
+    # Новий власник пари читає курсори й seen з бази — спершу дописуємо свої
+    flush()
+    with transaction() as conn:
+        conn.executemany(
+            "DELETE FROM leases WHERE address = ? AND contract = ? AND worker_id = ?",
+            [(address, contract, worker_id) for address, contract in pairs],
+        )
+
+# ── Стан діалогів ────────────────────
+# Крок, на якому користувач зараз у діалозі додавання гаманця/токена.
+
+def get_conv_state(user_id) -> dict | None:
+    row = _db().execute(
+        "SELECT state FROM conv_state WHERE user_id = ? AND expires >= ?", (str(user_id), time.time())
+    ).fetchone()
+    return json.loads(row["state"]) if row else None
+
+def set_conv_state(user_id, state: dict, ttl: float) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO conv_state(user_id, state, expires) VALUES (?, ?, ?)",
+            (str(user_id), json.dumps(state, ensure_ascii=False), time.time() + ttl),
+        )
+
+def delete_conv_state(user_id) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM conv_state WHERE user_id = ?", (str(user_id),))
+
+def purge_conv_states() -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM conv_state WHERE expires < ?", (time.time(),))
+
+# ── Імпорт з data.json ────────────────
+# Лише для одноразового переносу в порожню базу: DELETE FROM users каскадом
+# стирає й seen_sets, тож повторний запис load_data() (без seen) їх би втратив.
+
+def _write_all(conn: sqlite3.Connection, data: dict) -> None:
+    conn.execute("DELETE FROM users")  # ON DELETE CASCADE прибирає решту
+    for user_id, info in data.items():
+        _ensure_user(conn, user_id)
+        conn.executemany(
+            "INSERT INTO wallets(user_id, name, address) VALUES (?, ?, ?)",
+            [(user_id, w["name"], w["address"]) for w in info.get("wallets", [])],
+        )
+        conn.executemany(
+            "INSERT INTO tokens(user_id, wallet_name, contract, name, min, max) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, t["wallet_name"], t["contract"], t["name"], t["min"], t["max"])
+             for t in info.get("tokens", [])],
+        )
+        if info.get("seen"):
+            _write_seen(conn, user_id, _seen_from_hex(info["seen"]))
+    _bump_generation(conn)
+
+def _write_cursors(conn: sqlite3.Connection, cursors: dict) -> None:
+    conn.execute("DELETE FROM cursors")
+    rows = []
+    for key, cursor in cursors.items():
+        address, contract = key.split(":", 1)
+        rows.append((address, contract, cursor["block"], cursor.get("hash")))
+    conn.executemany("INSERT INTO cursors(address, contract, block, hash) VALUES (?, ?, ?, ?)", rows)
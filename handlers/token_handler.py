@@ -8,10 +8,14 @@ from telegram.ext import (
     filters,
 )
 import logging
+import math
+from decimal import Decimal
 
-from data_manager import load_data, save_data
+from data_manager import get_user, add_token, remove_token
+from utils.token_meta import get_meta
+from utils.state_store import get_state_store
 
-token_states = {}
+OWNER = "token"
 
 # --- TOKEN LOGIC ---
 async def handle_token_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -22,14 +26,13 @@ async def handle_token_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def prompt_token_wallet_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    data = load_data()
-    wallets = data.get(user_id, {}).get("wallets", [])
+    wallets = get_user(user_id)["wallets"]
 
     if not wallets:
         await update.callback_query.message.reply_text("ℹ️ Спочатку додай гаманець.")
         return
 
-    token_states[user_id] = {"step": "select_wallet"}
+    get_state_store().set(user_id, {"owner": OWNER, "step": "select_wallet"})
     buttons = [
         [InlineKeyboardButton(w["name"], callback_data=f"token_wallet_{w['name']}")] for w in wallets
     ]
@@ -41,75 +44,85 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     user_id = str(update.effective_user.id)
     await query.answer()
     data = query.data
-    state = token_states.get(user_id, {})
+    states = get_state_store()
+    state = states.get(user_id) or {}
 
-    if data.startswith("token_wallet_") and state.get("step") == "select_wallet":
+    if data.startswith("token_wallet_") and state.get("owner") == OWNER and state.get("step") == "select_wallet":
         wallet_name = data.replace("token_wallet_", "")
-        token_states[user_id] = {
+        states.set(user_id, {
+            "owner": OWNER,
             "wallet_name": wallet_name,
             "step": "awaiting_contract"
-        }
+        })
         await query.message.reply_text("🔹 Введи контракт токену:")
 
     elif data.startswith("remove_token_"):
         token_name = data.replace("remove_token_", "")
-        data_store = load_data()
-        user_data = data_store.get(user_id, {})
-        tokens = user_data.get("tokens", [])
-        updated_tokens = [t for t in tokens if t["name"] != token_name]
-        data_store[user_id]["tokens"] = updated_tokens
-        save_data(data_store)
+        remove_token(user_id, token_name)
         await query.message.reply_text(f"🗑 Токен `{token_name}` видалено.", parse_mode="Markdown")
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
     text = update.message.text.strip()
-    state = token_states.get(user_id)
-    if not state:
+    states = get_state_store()
+    state = states.get(user_id)
+    if not state or state.get("owner") != OWNER:
         return
 
-    data_store = load_data()
-    user_info = data_store.setdefault(user_id, {"wallets": [], "tokens": [], "seen": []})
-
     if state["step"] == "awaiting_contract":
-        state["contract"] = text
+        try:
+            meta = await get_meta(text)
+        except Exception as e:
+            logging.info("token contract %r rejected: %s", text, e)
+            await update.message.reply_text("❌ Не вдалося знайти токен BEP-20 за цією адресою. Спробуй ще раз:")
+            return
+        state["contract"] = meta["contract"]
         state["step"] = "awaiting_name"
-        await update.message.reply_text("🔹 Введи назву токену:")
+        states.set(user_id, state)
+        if meta.get("symbol"):
+            await update.message.reply_text(f"🔹 Знайдено {meta['symbol']}. Введи назву токену:")
+        else:
+            await update.message.reply_text("🔹 Введи назву токену:")
 
     elif state["step"] == "awaiting_name":
         state["token_name"] = text
         state["step"] = "awaiting_min"
+        states.set(user_id, state)
         await update.message.reply_text("🔹 Введи мінімальну кількість токенів:")
 
     elif state["step"] == "awaiting_min":
-        try:
-            float(text)
-            state["min"] = text
-            state["step"] = "awaiting_max"
-            await update.message.reply_text("🔹 Введи максимальну кількість токенів:")
-        except ValueError:
+        if _parse_amount(text) is None:
             await update.message.reply_text("❌ Введи число.")
+            return
+        state["min"] = text
+        state["step"] = "awaiting_max"
+        states.set(user_id, state)
+        await update.message.reply_text("🔹 Введи максимальну кількість токенів:")
 
     elif state["step"] == "awaiting_max":
-        try:
-            float(text)
-            user_info["tokens"].append({
-                "wallet_name": state["wallet_name"],
-                "contract": state["contract"],
-                "name": state["token_name"],
-                "min": state["min"],
-                "max": text
-            })
-            save_data(data_store)
-            token_states.pop(user_id)
-            await update.message.reply_text("✅ Токен додано.")
-        except ValueError:
+        amount = _parse_amount(text)
+        if amount is None:
             await update.message.reply_text("❌ Введи число.")
+            return
+        if amount < Decimal(state["min"]):
+            await update.message.reply_text("❌ Максимум не може бути меншим за мінімум. Введи ще раз:")
+            return
+        add_token(user_id, state["wallet_name"], state["contract"], state["token_name"], state["min"], text)
+        states.pop(user_id)
+        await update.message.reply_text("✅ Токен додано.")
+
+def _parse_amount(text: str) -> Decimal | None:
+    """Скінченне число або None; "inf", "nan" і "1e999" (поза межами float) відкидаються."""
+    try:
+        if not math.isfinite(float(text)):
+            return None
+        return Decimal(text)
+    except (ValueError, ArithmeticError):
+        return None
 
 async def prompt_token_removal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    data = load_data()
-    tokens = data.get(user_id, {}).get("tokens", [])
+    tokens = get_user(user_id)["tokens"]
 
     if not tokens:
         await update.callback_query.message.reply_text("ℹ️ Немає токенів для видалення.")
@@ -124,8 +137,7 @@ async def prompt_token_removal(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def show_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    data = load_data()
-    info = data.get(user_id, {})
+    info = get_user(user_id)
     msg = "📋 Список:\n\n"
 
     for w in info.get("wallets", []):
@@ -159,7 +171,7 @@ async def run_bot():
 
     # --- Додай свої callback-и на кнопки тут, якщо треба ---
 
-    print("Бот запущено!")
+    logging.info("Бот запущено!")
     await application.run_polling()
 
 if __name__ == "__main__":
@@ -1,53 +1,58 @@
+import logging
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from data_manager import load_data, save_data
+from data_manager import get_user, add_wallet, remove_wallet
+from utils.state_store import get_state_store
+from utils.token_meta import normalize_address
+
+OWNER = "wallet"
 
-user_states = {}
+log = logging.getLogger(__name__)
 
 # --- Додати гаманець ---
 async def prompt_wallet_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    user_states[user_id] = {"step": "awaiting_wallet_address"}
-    print(f"[wallet] user={user_id} — prompting wallet address")
+    user_id = str(update.effective_user.id)
+    get_state_store().set(user_id, {"owner": OWNER, "step": "awaiting_wallet_address"})
+    log.debug("user=%s — prompting wallet address", user_id)
     await update.callback_query.message.reply_text("🔹 Введи адресу гаманця (BSC):")
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if user_id not in user_states:
-        print(f"[wallet] user={user_id} — no state, skipping")
+    user_id = str(update.effective_user.id)
+    states = get_state_store()
+    state = states.get(user_id)
+    if not state or state.get("owner") != OWNER:
+        log.debug("user=%s — no state, skipping", user_id)
         return
 
-    state = user_states[user_id]
     text = update.message.text.strip()
-    print(f"[wallet] user={user_id}, step={state['step']}, input={text}")
-
-    data = load_data()
-    user_info = data.setdefault(str(user_id), {"wallets": [], "tokens": [], "seen": []})
+    log.debug("user=%s, step=%s, input=%s", user_id, state["step"], text)
 
     if state["step"] == "awaiting_wallet_address":
-        if len(user_info["wallets"]) >= 5:
+        if len(get_user(user_id)["wallets"]) >= 5:
             await update.message.reply_text("❌ Можна додати не більше 5 гаманців.")
             return
-        state["address"] = text
+        try:
+            address = normalize_address(text)
+        except ValueError:
+            await update.message.reply_text("❌ Некоректна адреса. Введи адресу BSC (0x і 40 hex-символів):")
+            return
+        state["address"] = address
         state["step"] = "awaiting_wallet_name"
+        states.set(user_id, state)
         await update.message.reply_text("🔹 Введи назву для цього гаманця:")
 
     elif state["step"] == "awaiting_wallet_name":
-        user_info["wallets"].append({
-            "name": text,
-            "address": state["address"]
-        })
-        save_data(data)
-        user_states.pop(user_id)
+        add_wallet(user_id, text, state["address"])
+        states.pop(user_id)
         await update.message.reply_text("✅ Гаманець додано.")
-        print(f"[wallet] user={user_id} — wallet added")
+        log.info("user=%s — wallet added", user_id)
 
 # --- Видалити гаманець ---
 async def prompt_wallet_removal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    data = load_data()
-    wallets = data.get(user_id, {}).get("wallets", [])
+    wallets = get_user(user_id)["wallets"]
 
     if not wallets:
         await update.callback_query.message.reply_text("ℹ️ Немає доданих гаманців.")
@@ -68,14 +73,10 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     data = query.data
     if data.startswith("remove_wallet_"):
         wallet_name = data.replace("remove_wallet_", "")
-        data_store = load_data()
-        wallets = data_store.get(user_id, {}).get("wallets", [])
-
-        data_store[user_id]["wallets"] = [w for w in wallets if w["name"] != wallet_name]
-        save_data(data_store)
+        remove_wallet(user_id, wallet_name)
 
         await query.message.reply_text(f"🗑 Гаманець {wallet_name} видалено.")
-        print(f"[wallet] user={user_id} — wallet '{wallet_name}' removed")
+        log.info("user=%s — wallet %r removed", user_id, wallet_name)
 
 # --- Обгортка для обробки гаманця ---
 async def handle_wallet_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
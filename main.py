@@ -13,6 +13,11 @@ from telegram.ext import (
 )
 from handlers import wallet_handler, token_handler
 from utils.scheduler import start_scheduler
+from utils.http_client import start_http, close_http
+from utils.notifier import start_notifier, stop_notifier
+from utils.state_store import get_state_store
+from utils.metrics import start_metrics_server, stop_metrics_server
+from data_manager import flush
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,13 +25,17 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 WEBHOOK_URL    = os.getenv("WEBHOOK_URL")
 PORT           = int(os.environ.get("PORT", "5000"))
+# 0 — лише webhook; опитуванням займаються окремі воркери (python -m utils.worker)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+# DEBUG вмикає детальні логи хендлерів; /metrics — на METRICS_PORT
+LOG_LEVEL      = os.getenv("LOG_LEVEL", "INFO").upper()
 
 if not TELEGRAM_TOKEN or not WEBHOOK_URL:
     raise RuntimeError("❌ TELEGRAM_TOKEN або WEBHOOK_URL не задані!")
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
+    level=LOG_LEVEL,
 )
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -59,11 +68,24 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if data.startswith("remove_wallet_"):
         return await wallet_handler.handle_callback_query(update, context)
 
+# Хендлер, що веде діалог, за полем "owner" у стані користувача
+_TEXT_HANDLERS = {
+    wallet_handler.OWNER: wallet_handler.handle_text,
+    token_handler.OWNER:  token_handler.handle_text,
+}
+
 async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await wallet_handler.handle_text(update, context)
-    await token_handler.handle_text(update, context)
+    state = get_state_store().get(update.effective_user.id)
+    handler = _TEXT_HANDLERS.get(state.get("owner")) if state else None
+    if handler:
+        await handler(update, context)
+
+_scheduler_task = None
 
 async def on_startup(app):
+    global _scheduler_task
+    await start_http()
+    await start_metrics_server()
     await app.bot.set_webhook(WEBHOOK_URL)
     # set bot commands for /start and /menu
     await app.bot.set_my_commands([
@@ -71,8 +93,20 @@ async def on_startup(app):
         BotCommand("menu",  "Відкрити меню"),
         BotCommand("send",  "Надіслати повідомлення в канал"),
     ])
+    if not SCHEDULER_ENABLED:
+        logging.info("🔔 Вебхук встановлено, scheduler вимкнено (SCHEDULER_ENABLED=0)")
+        return
     logging.info("🔔 Вебхук встановлено, запускаємо scheduler…")
-    asyncio.create_task(start_scheduler(app))
+    start_notifier(app.bot)
+    _scheduler_task = asyncio.create_task(start_scheduler(app))
+
+async def on_shutdown(app):
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+    await stop_notifier()
+    flush()
+    await close_http()
+    await stop_metrics_server()
 
 async def on_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await start(update, context)
@@ -99,6 +133,7 @@ def main():
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_message))
 
     app.post_init = on_startup
+    app.post_shutdown = on_shutdown
 
     app.run_webhook(
         listen="0.0.0.0",
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Модулі бота імпортуються з кореня репозиторію (utils.*, data_manager)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# data_manager створює базу в DATA_DIR при імпорті — не чіпаємо /data
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="alert-bot-tests-"))
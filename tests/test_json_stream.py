@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.json_stream import ArrayStream, iter_array
+
+ITEMS = [
+    {"hash": "0x1", "value": "10"},
+    {"hash": "0x2", "tokenName": 'say \\"hi\\" {not} [json]', "value": "20"},
+    {"hash": "0x3", "extra": {"nested": [1, {"deep": "}"}]}, "value": "30"},
+]
+BODY = json.dumps({"status": "1", "message": "OK", "result": ITEMS}).encode()
+
+
+def _feed_in_chunks(body: bytes, size: int):
+    stream = ArrayStream()
+    items = []
+    for i in range(0, len(body), size):
+        items.extend(stream.feed(body[i:i + size]))
+    items.extend(stream.feed(b"", final=True))
+    return stream, [json.loads(item) for item in items]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(BODY)])
+def test_items_survive_any_chunk_split(size):
+    stream, items = _feed_in_chunks(BODY, size)
+    assert items == ITEMS
+    assert stream.fields == {"status": "1", "message": "OK"}
+    assert stream.done
+
+
+def test_escaped_quotes_and_brackets_inside_strings():
+    body = json.dumps({"result": [{"a": 'x\\"}]{['}, {"b": "\\\\"}]}).encode()
+    _, items = _feed_in_chunks(body, 5)
+    assert items == [{"a": 'x\\"}]{['}, {"b": "\\\\"}]
+
+
+def test_error_body_without_array():
+    # BscScan віддає помилку рядком у result, а не масивом
+    body = b'{"status":"0","message":"NOTOK","result":"Max rate limit reached"}'
+    stream, items = _feed_in_chunks(body, 4)
+    assert items == []
+    assert stream.fields == {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+
+
+def test_scalar_fields_after_array():
+    body = b'{"result":[1, 2],"status":"1","total":2}'
+    stream, items = _feed_in_chunks(body, 3)
+    assert items == [1, 2]
+    assert stream.fields == {"status": "1", "total": 2}
+
+
+def test_not_an_object_is_rejected():
+    with pytest.raises(ValueError):
+        ArrayStream().feed(b"<html>502 Bad Gateway</html>")
+
+
+def test_truncated_response_raises():
+    async def chunks():
+        yield BODY[: len(BODY) // 2]
+
+    async def collect():
+        return [item async for item in iter_array(chunks(), ArrayStream())]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
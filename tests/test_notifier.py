@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("telegram")
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+import data_manager
+from utils import notifier as notifier_module
+from utils.notifier import Notifier
+
+CONTRACT = "0x" + "c" * 40
+CHAT_ID = -100
+_owners = itertools.count()
+
+
+class FakeBot:
+    """Відповідає на send_message за сценарієм: виняток або успіх для кожної спроби."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def send_message(self, **kwargs):
+        self.calls.append(time.monotonic())
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if outcome is not None:
+            raise outcome
+
+
+@pytest.fixture(autouse=True)
+def fast_limits(monkeypatch):
+    monkeypatch.setattr(notifier_module, "COALESCE_DELAY", 0)
+    monkeypatch.setattr(notifier_module, "CHAT_INTERVAL", 0.1)
+    monkeypatch.setattr(notifier_module, "SEND_RETRIES", 2)
+    monkeypatch.setattr(notifier_module, "RETRY_LATER", 3600)
+    # Без випадкової затримки між повторами лишається тільки пауза слота
+    monkeypatch.setattr(notifier_module.random, "uniform", lambda low, high: 0)
+
+
+def _outbox_rows(owner) -> list:
+    data_manager.flush()
+    return data_manager._db().execute("SELECT tx_hash FROM outbox WHERE owner = ?", (owner,)).fetchall()
+
+
+def _run(bot) -> Notifier:
+    notifier = Notifier(bot, workers=1, owner=f"test-notifier-{next(_owners)}")
+
+    async def scenario():
+        notifier.start()
+        notifier.enqueue("TKN", CONTRACT, "0xabc", 1, chat_id=CHAT_ID)
+        # Рядок уже в базі — перевіряємо саме видалення з outbox
+        data_manager.flush()
+        await notifier.stop(timeout=5)
+
+    asyncio.run(scenario())
+    return notifier
+
+
+def test_permanent_error_drops_and_clears_outbox():
+    bot = FakeBot(BadRequest("Can't parse entities"))
+    notifier = _run(bot)
+    assert len(bot.calls) == 1
+    assert notifier.dropped == 1 and notifier.sent == 0
+    assert _outbox_rows(notifier.owner) == []
+
+
+def test_transient_error_is_retried_within_chat_limit():
+    bot = FakeBot(TimedOut(), TimedOut())
+    notifier = _run(bot)
+    assert len(bot.calls) == 3 and notifier.sent == 1
+    gaps = [b - a for a, b in zip(bot.calls, bot.calls[1:])]
+    assert min(gaps) >= notifier_module.CHAT_INTERVAL * 0.9
+    assert _outbox_rows(notifier.owner) == []
+
+
+def test_retry_after_pauses_sending():
+    bot = FakeBot(RetryAfter(1))
+    notifier = _run(bot)
+    assert len(bot.calls) == 2 and notifier.sent == 1
+    assert bot.calls[1] - bot.calls[0] >= 0.9
+    assert _outbox_rows(notifier.owner) == []
+
+
+def test_exhausted_retries_keep_alert_in_outbox():
+    bot = FakeBot(*[TimedOut()] * 3)
+    notifier = _run(bot)
+    assert len(bot.calls) == 3
+    assert notifier.sent == 0 and notifier.dropped == 0
+    assert len(_outbox_rows(notifier.owner)) == 1
@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("telegram")
+
+from utils.scheduler import PollQueue
+
+A = ("0x" + "a" * 40, "0x" + "c" * 40)
+B = ("0x" + "b" * 40, "0x" + "c" * 40)
+
+
+def _drain(queue, now) -> list:
+    due = queue.pop_due(now)
+    for pair in due:
+        queue.reschedule(pair, matched=0)
+    return due
+
+
+def test_new_pairs_are_due_immediately():
+    queue = PollQueue(min_interval=5, max_interval=300)
+    queue.sync([A, B])
+    assert sorted(queue.pop_due(float("inf"))) == sorted([A, B])
+
+
+def test_idle_pair_backs_off():
+    queue = PollQueue(min_interval=5, max_interval=20)
+    queue.sync([A])
+    queue.pop_due(float("inf"))
+    queue.reschedule(A, matched=0)
+    assert queue._intervals[A] == 10
+    queue._intervals[A] = 20
+    queue.pop_due(float("inf"))
+    queue.reschedule(A, matched=0)
+    assert queue._intervals[A] == 20
+    queue.pop_due(float("inf"))
+    queue.reschedule(A, matched=3)
+    assert queue._intervals[A] == 5
+
+
+def test_removed_pair_is_not_polled():
+    queue = PollQueue()
+    queue.sync([A, B])
+    queue.sync([B])
+    assert queue.pop_due(float("inf")) == [B]
+
+
+def test_readded_pair_keeps_a_single_heap_entry():
+    queue = PollQueue(min_interval=5, max_interval=300)
+    queue.sync([A])
+    _drain(queue, float("inf"))
+    # Видалено й одразу повернуто, поки старий запис ще в купі
+    queue.sync([])
+    queue.sync([A])
+    live = [entry for entry in queue._heap if queue._live.get(entry[2]) == entry[1]]
+    assert len(live) == 1
+    polls = 0
+    for _ in range(10):
+        polls += len(_drain(queue, float("inf")))
+    assert polls == 10
+
+
+def test_pair_in_flight_is_not_pushed_again():
+    queue = PollQueue()
+    queue.sync([A])
+    assert queue.pop_due(float("inf")) == [A]
+    queue.sync([])
+    queue.sync([A])
+    assert queue.pop_due(float("inf")) == []
+    queue.reschedule(A, matched=1)
+    assert queue.pop_due(float("inf")) == [A]
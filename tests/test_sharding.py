@@ -0,0 +1,27 @@
+from utils.sharding import HashRing, Shard
+
+PAIRS = [("0x" + f"{i:040x}", "0x" + "c" * 40) for i in range(32)]
+
+
+def test_moved_pair_is_kept_until_its_poll_finishes():
+    a, b = Shard("test-a"), Shard("test-b")
+    try:
+        a.refresh(PAIRS)
+        assert a.owned == set(PAIRS)
+        # Другий воркер з'являється — частина пар переїжджає до нього
+        b.refresh(PAIRS)
+        ring = HashRing(["test-a", "test-b"])
+        moved = next(p for p in PAIRS if ring.owner(f"{p[0]}:{p[1]}") == "test-b")
+
+        # Поки пару ще опитує a, оренду він не віддає, але й не вважає пару своєю
+        a.refresh(PAIRS, busy={moved})
+        assert moved not in a.owned and moved in a.draining
+        assert moved not in b.refresh(PAIRS)
+
+        # Опитування завершилось — оренда звільняється, b забирає пару
+        a.refresh(PAIRS)
+        assert not a.draining
+        assert moved in b.refresh(PAIRS)
+    finally:
+        a.close()
+        b.close()
@@ -0,0 +1,79 @@
+import math
+
+from utils.subscriptions import Subscription, SubscriptionIndex
+
+WALLET = "0x" + "a" * 40
+CONTRACT = "0x" + "c" * 40
+PAIR = (WALLET, CONTRACT)
+
+
+def _user(*ranges, wallet=WALLET):
+    return {
+        "wallets": [{"name": "w", "address": wallet}],
+        "tokens": [
+            {"wallet_name": "w", "contract": CONTRACT, "name": f"T{i}", "min": low, "max": high}
+            for i, (low, high) in enumerate(ranges)
+        ],
+    }
+
+
+def _index(users: dict) -> SubscriptionIndex:
+    index = SubscriptionIndex()
+    index.rebuild(users)
+    return index
+
+
+def _matched(index, value, decimals=18) -> list:
+    return sorted((s.user_id, s.name) for s in index.match(PAIR, value, decimals))
+
+
+def test_units_round_inward():
+    sub = Subscription("1", {"name": "T", "contract": CONTRACT, "min": "0.0000001", "max": "1.0000001"})
+    # min округлюється вгору, max — вниз: межі не розширюються через дробові одиниці
+    assert sub.units(6) == (1, 1000000)
+    assert sub.units(7) == (1, 10000001)
+
+
+def test_match_boundaries_are_inclusive():
+    index = _index({"1": _user(("1", "2"))})
+    one = 10 ** 18
+    assert _matched(index, one) == [("1", "T0")]
+    assert _matched(index, 2 * one) == [("1", "T0")]
+    assert _matched(index, one - 1) == []
+    assert _matched(index, 2 * one + 1) == []
+
+
+def test_decimal_bounds_are_exact():
+    # 0.1 + 0.2 у float — 0.30000000000000004; у Decimal межа точна
+    index = _index({"1": _user(("0.3", "0.3"))})
+    assert _matched(index, 3 * 10 ** 17) == [("1", "T0")]
+
+
+def test_overlapping_subscribers_of_one_pair():
+    index = _index({"1": _user(("0", "10")), "2": _user(("5", "100")), "3": _user(("50", "60"))})
+    assert _matched(index, 7 * 10 ** 18) == [("1", "T0"), ("2", "T0")]
+    assert _matched(index, 55 * 10 ** 18) == [("2", "T0"), ("3", "T0")]
+    assert _matched(index, 200 * 10 ** 18) == []
+
+
+def test_infinite_bounds_are_open():
+    sub = Subscription("1", {"name": "T", "contract": CONTRACT, "min": "-inf", "max": "inf"})
+    assert sub.units(18) == (0, math.inf)
+    index = _index({"1": _user(("1", "inf"))})
+    assert _matched(index, 10 ** 40) == [("1", "T0")]
+
+
+def test_bad_subscription_does_not_break_pair():
+    index = _index({
+        "1": _user(("1", "nan"), ("inf", "inf"), ("1", "1e999999999")),
+        "2": _user(("0", "100")),
+    })
+    assert _matched(index, 10 ** 18) == [("2", "T0")]
+
+
+def test_update_user_is_incremental():
+    index = _index({"1": _user(("0", "10")), "2": _user(("0", "10"))})
+    index.update_user("1", None)
+    assert _matched(index, 10 ** 18) == [("2", "T0")]
+    index.update_user("2", None)
+    assert PAIR not in index
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from utils.metrics import Counter, Histogram
+
+# Пул з'єднань живе весь час роботи застосунку: start_http() у main.on_startup,
+# close_http() при зупинці. Так DNS і TLS-рукостискання не повторюються щоциклу.
+POOL_LIMIT  = int(os.getenv("HTTP_POOL_LIMIT", "20"))
+DNS_TTL     = int(os.getenv("HTTP_DNS_TTL", "300"))
+KEEPALIVE   = float(os.getenv("HTTP_KEEPALIVE", "30"))
+TIMEOUT     = float(os.getenv("HTTP_TIMEOUT", "15"))
+RETRIES     = int(os.getenv("HTTP_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP  = 10.0
+
+_session = None
+
+log = logging.getLogger(__name__)
+
+HTTP_REQUESTS = Counter("http_requests_total", "Зовнішні HTTP-запити за хостом і статусом", ("host", "status"))
+HTTP_LATENCY  = Histogram("http_request_seconds", "Тривалість зовнішніх HTTP-запитів", ("host",))
+HTTP_RETRIES  = Counter("http_retries_total", "Повтори зовнішніх HTTP-запитів", ("host",))
+
+
+class RetryableStatus(Exception):
+    def __init__(self, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+async def start_http() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            ttl_dns_cache=DNS_TTL,
+            keepalive_timeout=KEEPALIVE,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+        )
+    return _session
+
+
+async def close_http() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    if _session is None or _session.closed:
+        raise RuntimeError("HTTP-клієнт не запущено: виклич start_http()")
+    return _session
+
+
+def _backoff(attempt: int, retry_after: float | None = None) -> float:
+    # "Full jitter": випадкова затримка до експоненційної межі
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_after(resp: aiohttp.ClientResponse) -> float | None:
+    value = resp.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def _read_json(resp: aiohttp.ClientResponse):
+    return await resp.json(content_type=None)
+
+
+async def request_json(method: str, url: str, **kwargs):
+    """HTTP-запит з таймаутом і повторами (з джитером) на 429/5xx та мережеві збої."""
+    return await request(method, url, _read_json, **kwargs)
+
+
+async def request(method: str, url: str, read, **kwargs):
+    """Як request_json, але тіло читає read(resp) — напр. потоково.
+
+    Якщо з'єднання обірвалось посеред читання, запит повторюється з нуля,
+    тож read не повинен мати побічних ефектів поза своїм результатом.
+    """
+    session = get_session()
+    host = urlsplit(url).hostname or ""
+    for attempt in range(RETRIES + 1):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                status = resp.status
+                if resp.status == 429 or resp.status >= 500:
+                    raise RetryableStatus(resp.status, _retry_after(resp))
+                resp.raise_for_status()
+                return await read(resp)
+        except (RetryableStatus, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == RETRIES:
+                raise
+            delay = _backoff(attempt, getattr(e, "retry_after", None))
+            log.warning("⚠️ %s %s: %r, повтор через %.1f с", method, url, e, delay)
+        finally:
+            HTTP_REQUESTS.inc(host=host, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - started, host=host)
+        HTTP_RETRIES.inc(host=host)
+        await asyncio.sleep(delay)
+
+
+async def get_json(url: str, params: dict | None = None):
+    return await request_json("GET", url, params=params)
+
+
+async def post_json(url: str, payload):
+    return await request_json("POST", url, json=payload)
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from contextlib import aclosing
+
+from utils.http_client import post_json, request
+from utils.json_stream import ArrayStream, iter_array
+from utils.token_bucket import TokenBucket
+
+# Яке джерело використовує планувальник: "bscscan" (опитування tokentx по парах)
+# або "rpc" (Transfer-логи через eth_getLogs, один запит на діапазон блоків)
+INGESTION_SOURCE = os.getenv("INGESTION_SOURCE", "bscscan")
+
+BSCSCAN_API_URL = os.getenv("BSCSCAN_API_URL", "https://api.bscscan.com/api")
+# Скільки запитів до BscScan може виконуватись одночасно
+MAX_CONCURRENCY = int(os.getenv("BSCSCAN_MAX_CONCURRENCY", "10"))
+# Ліміт BscScan: запитів на секунду (безкоштовний план — 5/с)
+BSCSCAN_RPS = float(os.getenv("BSCSCAN_RPS", "5"))
+# Розмір сторінки tokentx і скільки сторінок нових трансферів читати за одне опитування
+PAGE_SIZE = int(os.getenv("BSCSCAN_PAGE_SIZE", "100"))
+MAX_PAGES = int(os.getenv("BSCSCAN_MAX_PAGES", "10"))
+# Перше опитування пари без курсора дивиться лише на останні N транзакцій
+INITIAL_LOOKBACK = 50
+# Відповідь tokentx читаємо шматками, не буферизуючи всю сторінку
+STREAM_CHUNK = 64 * 1024
+
+BSC_RPC_URL = os.getenv("BSC_RPC_URL", "https://bsc-dataseed.bnbchain.org")
+# Скільки блоків максимум в одному eth_getLogs і скільки підтверджень чекаємо
+RPC_MAX_BLOCK_RANGE = int(os.getenv("RPC_MAX_BLOCK_RANGE", "500"))
+RPC_CONFIRMATIONS   = int(os.getenv("RPC_CONFIRMATIONS", "3"))
+RPC_POLL_INTERVAL   = float(os.getenv("RPC_POLL_INTERVAL", "3"))
+# Скільки контрактів / відправників максимум в одному фільтрі eth_getLogs
+RPC_FILTER_CHUNK    = int(os.getenv("RPC_FILTER_CHUNK", "100"))
+
+log = logging.getLogger(__name__)
+
+_ADDRESS_RE = re.compile(r"^0x[0-9a-f]{40}$")
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+class IngestionSource:
+    """Джерело трансферів для планувальника.
+
+    Джерела бувають двох видів:
+      * per_pair — опитуються окремо для кожної пари (address, contract)
+        через fetch(pair, cursor);
+      * за діапазоном блоків — head() і fetch_range(pairs, from_block, to_block)
+        повертають трансфери одразу для всіх пар.
+    Трансфери мають формат відповіді BscScan tokentx: from, value,
+    tokenDecimal, hash, blockNumber.
+
+    known(tx_hash) у fetch — чи трансфер уже оброблено для всіх підписників
+    пари; джерело може на ньому зупинитись, бо старіші теж оброблені.
+    """
+
+    name = "base"
+    per_pair = True
+
+    async def fetch(self, pair, cursor, known=None):
+        raise NotImplementedError
+
+    async def head(self) -> int:
+        raise NotImplementedError
+
+    async def fetch_range(self, pairs, from_block: int, to_block: int) -> dict:
+        raise NotImplementedError
+
+
+class BscScanSource(IngestionSource):
+    name = "bscscan"
+    per_pair = True
+
+    def __init__(self, api_key: str | None = None, url: str = BSCSCAN_API_URL):
+        self.api_key = api_key if api_key is not None else os.getenv("BSCSCAN_API_KEY")
+        self.url = url
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        self._bucket = TokenBucket(BSCSCAN_RPS)
+
+    async def _request_page(self, address, contract, known=None, **params) -> "_Page":
+        params = {
+            "module": "account",
+            "action": "tokentx",
+            "address": address,
+            "contractaddress": contract,
+            **params,
+            "apikey": self.api_key or "",
+        }
+
+        async def read(resp):
+            return await _read_page(resp, address, known)
+
+        async with self._semaphore:
+            await self._bucket.acquire()
+            page = await request("GET", self.url, read, params=params)
+        fields = page.fields
+        # Якщо елементи масиву вже прийшли, відповідь успішна (status іде перед result)
+        if fields.get("status") != "1" and not page.count:
+            # "No transactions found" — це не помилка, просто нових трансферів немає
+            if fields.get("message", "").startswith("No transactions found"):
+                return page
+            raise RuntimeError(f"BscScan: {fields.get('message')} {fields.get('result')}")
+        return page
+
+    async def fetch(self, pair, cursor, known=None):
+        """Повертає (нові трансфери у порядку зростання блоку, новий курсор).
+
+        Без курсора — беремо останні INITIAL_LOOKBACK транзакцій (від нових до
+        старих, до першої вже відомої). З курсором — лише блоки після нього,
+        сторінками вперед. В обох випадках лишаються тільки трансфери з
+        from == address; курсор рухається і за відсіяними.
+        """
+        address, contract = pair
+        if cursor is None:
+            page = await self._request_page(
+                address, contract, known, sort="desc", page=1, offset=INITIAL_LOOKBACK,
+            )
+            if page.first is None:
+                return [], None
+            return list(reversed(page.transfers)), _cursor_of(page.first)
+
+        transfers = []
+        last = None
+        truncated = False
+        for page_no in range(1, MAX_PAGES + 1):
+            page = await self._request_page(
+                address, contract,
+                startblock=cursor["block"] + 1, sort="asc", page=page_no, offset=PAGE_SIZE,
+            )
+            transfers.extend(page.transfers)
+            last = page.last or last
+            if page.count < PAGE_SIZE:
+                break
+        else:
+            truncated = True
+
+        if last is None:
+            return [], cursor
+
+        new_cursor = _cursor_of(last)
+        if truncated:
+            # Сторінка могла обірватись посеред блоку: наступного разу перечитаємо
+            # цей блок цілком, а вже оброблені хеші відсіє seen. Якщо всі сторінки
+            # припали на один блок — рухаємось далі, щоб не застрягнути на ньому
+            if new_cursor["block"] - 1 > cursor["block"]:
+                new_cursor["block"] -= 1
+        return transfers, new_cursor
+
+
+# Відправник трансферу прямо в сирих байтах елемента — без json.loads
+_FROM = re.compile(rb'"from"\s*:\s*"(0x[0-9a-fA-F]{40})"')
+
+
+class _Page:
+    """Сторінка tokentx, прочитана потоково."""
+
+    def __init__(self):
+        self.fields = {}      # status, message (і result, якщо це текст помилки)
+        self.transfers = []   # лише трансфери з from == address, у порядку відповіді
+        self.count = 0        # усі елементи сторінки, разом з відсіяними
+        self.first = None     # сирі байти першого й останнього елемента — для курсора
+        self.last = None
+
+
+async def _read_page(resp, address: str, known=None) -> _Page:
+    """Розбирає масив result по одному елементу.
+
+    Елементи з чужим from відкидаються до json.loads; на першому трансфері,
+    для якого known(hash) істинне, читання зупиняється (решта з'єднання
+    закривається, не дочитуючи сторінку).
+    """
+    page = _Page()
+    stream = ArrayStream("result")
+    sender = address.lower().encode()
+    async with aclosing(iter_array(resp.content.iter_chunked(STREAM_CHUNK), stream)) as items:
+        async for raw in items:
+            page.count += 1
+            if page.first is None:
+                page.first = raw
+            page.last = raw
+            m = _FROM.search(raw)
+            if m is None or m.group(1).lower() != sender:
+                continue
+            tx = json.loads(raw)
+            if known is not None and known(tx["hash"]):
+                break
+            page.transfers.append(tx)
+    page.fields = stream.fields
+    return page
+
+
+def _cursor_of(raw: bytes) -> dict:
+    tx = json.loads(raw)
+    return {"block": int(tx["blockNumber"]), "hash": tx["hash"]}
+
+
+class RpcError(RuntimeError):
+    pass
+
+
+_rpc_ids = 0
+
+
+async def rpc_call(method: str, params: list, url: str = BSC_RPC_URL):
+    global _rpc_ids
+    _rpc_ids += 1
+    res = await post_json(url, {"jsonrpc": "2.0", "id": _rpc_ids, "method": method, "params": params})
+    if res.get("error"):
+        raise RpcError(f"{method}: {res['error']}")
+    return res["result"]
+
+
+class RpcLogSource(IngestionSource):
+    """Transfer-події BEP-20 через eth_getLogs.
+
+    Один запит на діапазон блоків фільтрує всі відстежувані контракти й
+    адреси-відправники; події розкладаються по парах (from, contract).
+    """
+
+    name = "rpc"
+    per_pair = False
+    poll_interval = RPC_POLL_INTERVAL
+    max_block_range = RPC_MAX_BLOCK_RANGE
+
+    def __init__(self, url: str = BSC_RPC_URL, confirmations: int = RPC_CONFIRMATIONS,
+                 filter_chunk: int = RPC_FILTER_CHUNK):
+        self.url = url
+        self.confirmations = confirmations
+        self.filter_chunk = filter_chunk
+        self._rejected = set()  # некоректні пари, про які вже попередили
+
+    async def call(self, method: str, params: list):
+        return await rpc_call(method, params, self.url)
+
+    async def head(self) -> int:
+        return int(await self.call("eth_blockNumber", []), 16) - self.confirmations
+
+    async def decimals(self, contract: str) -> int:
+        # Імпорт тут: token_meta сам ходить у RPC через цей модуль
+        from utils.token_meta import get_meta
+        return (await get_meta(contract, rpc_url=self.url))["decimals"]
+
+    def _valid_pairs(self, pairs) -> set:
+        """Відкидає пари з некоректною адресою: одна така зламала б спільний фільтр для всіх."""
+        valid = set()
+        for pair in pairs:
+            if _ADDRESS_RE.match(pair[0]) and _ADDRESS_RE.match(pair[1]):
+                valid.add(pair)
+            elif pair not in self._rejected:
+                self._rejected.add(pair)
+                log.warning("⚠️ Пропускаю пару з некоректною адресою: %s", pair)
+        return valid
+
+    async def _get_logs(self, from_block: int, to_block: int, contracts: list, senders: list) -> list:
+        return await self.call("eth_getLogs", [{
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+            "address": contracts,
+            "topics": [TRANSFER_TOPIC, senders],
+        }])
+
+    async def fetch_range(self, pairs, from_block: int, to_block: int) -> dict:
+        pairs = self._valid_pairs(pairs)
+        if not pairs:
+            return {}
+        contracts = sorted({contract for _, contract in pairs})
+        senders = sorted({"0x" + address[2:].rjust(64, "0") for address, _ in pairs})
+        # Великі списки ріжемо на шматки, щоб не впертись у ліміти вузла на розмір фільтра
+        size = self.filter_chunk
+        results = await asyncio.gather(*(
+            self._get_logs(from_block, to_block, contracts[i:i + size], senders[j:j + size])
+            for i in range(0, len(contracts), size)
+            for j in range(0, len(senders), size)
+        ))
+
+        routed = {}
+        for event in (event for logs in results for event in logs):
+            topics = event.get("topics", [])
+            if len(topics) < 3 or event.get("removed"):
+                continue
+            contract = event["address"].lower()
+            sender = "0x" + topics[1][-40:].lower()
+            pair = (sender, contract)
+            # Фільтр за адресою і відправником — декартів добуток, тож відсіюємо зайве
+            if pair not in pairs:
+                continue
+            routed.setdefault(pair, []).append({
+                "from": sender,
+                "to": "0x" + topics[2][-40:].lower(),
+                "value": str(int(event["data"], 16)),
+                "tokenDecimal": str(await self.decimals(contract)),
+                "hash": event["transactionHash"],
+                "blockNumber": str(int(event["blockNumber"], 16)),
+                "contractAddress": contract,
+            })
+        return routed
+
+
+def make_source(name: str = INGESTION_SOURCE) -> IngestionSource:
+    if name == "bscscan":
+        return BscScanSource()
+    if name == "rpc":
+        return RpcLogSource()
+    raise ValueError(f"Невідоме джерело INGESTION_SOURCE={name!r}")
@@ -0,0 +1,139 @@
+"""Потоковий розбір JSON-відповідей виду {"status": ..., "result": [ {...}, ... ]}.
+
+ArrayStream приймає відповідь шматками і віддає сирі байти кожного елемента
+масиву, щойно той повністю прийшов. Інші поля верхнього рівня (status,
+message) розбираються й складаються у fields. Так виклик може відсіяти чи
+зупинитись на елементі ще до json.loads і не тримати в пам'яті всю сторінку.
+"""
+import json
+import re
+
+_WS = b" \t\r\n"
+# Цілий рядок (з екрануванням), дужка, або одинока лапка — початок ще не дочитаного рядка
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]|"')
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+
+_START, _KEY, _COLON, _VALUE, _ARRAY, _END = range(6)
+
+
+def _value_end(buf: bytearray, i: int, final: bool) -> int:
+    """Індекс одразу після JSON-значення, що починається з buf[i]; -1, якщо даних ще бракує."""
+    if buf[i] == 0x7B:
+        # Швидкий шлях для плоских об'єктів (як трансфери tokentx): до першої '}'
+        # немає вкладених дужок, екранування, а лапки парні — тобто '}' не в рядку
+        j = buf.find(b"}", i)
+        if j < 0:
+            return -1
+        segment = buf[i:j]
+        if (segment.count(b'"') % 2 == 0 and segment.count(b"{") == 1
+                and b"[" not in segment and b"\\" not in segment):
+            return j + 1
+    if buf[i] == 0x22 or buf[i] in b"{[":
+        depth = 0
+        for m in _TOKEN.finditer(buf, i):
+            start, end = m.span()
+            c = buf[start]
+            if c == 0x22:
+                if end - start == 1:
+                    return -1
+                if depth == 0:
+                    return end
+            elif c in b"{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return end
+        return -1
+    # Число, true, false, null
+    m = _SCALAR_END.search(buf, i)
+    if m is not None:
+        return m.start()
+    return len(buf) if final else -1
+
+
+class ArrayStream:
+    def __init__(self, key: str = "result"):
+        self.key = key
+        self.fields = {}
+        self.done = False
+        self._buf = bytearray()
+        self._state = _START
+        self._name = None
+
+    def feed(self, data: bytes, final: bool = False) -> list:
+        """Додає шматок відповіді; повертає елементи масиву, що вже повністю прийшли."""
+        buf = self._buf
+        buf += data
+        items = []
+        i = 0
+        while True:
+            while i < len(buf) and buf[i] in _WS:
+                i += 1
+            if i >= len(buf):
+                break
+            c = buf[i]
+            state = self._state
+            if state == _START:
+                if c != 0x7B:  # {
+                    raise ValueError("очікувався JSON-об'єкт")
+                i += 1
+                self._state = _KEY
+            elif state == _KEY:
+                if c == 0x2C:  # ,
+                    i += 1
+                elif c == 0x7D:  # }
+                    i += 1
+                    self._state = _END
+                    self.done = True
+                else:
+                    end = _value_end(buf, i, final)
+                    if end < 0:
+                        break
+                    self._name = json.loads(buf[i:end])
+                    i = end
+                    self._state = _COLON
+            elif state == _COLON:
+                if c != 0x3A:  # :
+                    raise ValueError("очікувалась ':' після ключа")
+                i += 1
+                self._state = _VALUE
+            elif state == _VALUE:
+                if self._name == self.key and c == 0x5B:  # [
+                    i += 1
+                    self._state = _ARRAY
+                    continue
+                end = _value_end(buf, i, final)
+                if end < 0:
+                    break
+                self.fields[self._name] = json.loads(buf[i:end])
+                i = end
+                self._state = _KEY
+            elif state == _ARRAY:
+                if c == 0x2C:
+                    i += 1
+                elif c == 0x5D:  # ]
+                    i += 1
+                    self._state = _KEY
+                else:
+                    end = _value_end(buf, i, final)
+                    if end < 0:
+                        break
+                    items.append(bytes(buf[i:end]))
+                    i = end
+            else:
+                # Усе після закритого об'єкта ігноруємо
+                i = len(buf)
+        del buf[:i]
+        return items
+
+
+async def iter_array(chunks, stream: ArrayStream):
+    """Елементи масиву з асинхронного потоку байтів (напр. resp.content.iter_chunked())."""
+    async for chunk in chunks:
+        for item in stream.feed(chunk):
+            yield item
+    for item in stream.feed(b"", final=True):
+        yield item
+    if not stream.done:
+        raise ValueError("JSON-відповідь обірвалась")
@@ -0,0 +1,173 @@
+"""Метрики процесу у текстовому форматі Prometheus.
+
+Лічильники й гістограми живуть у пам'яті процесу; start_metrics_server()
+віддає їх на GET /metrics поруч з webhook-сервером (окремий порт METRICS_PORT).
+Для кількох воркерів кожен процес має власний /metrics, тож кожному треба
+свій METRICS_PORT (або 0). Якщо порт зайнятий, процес працює без /metrics.
+"""
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9091"))  # 0 — не запускати сервер
+# Межі кошиків гістограм затримок, секунди
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+log = logging.getLogger(__name__)
+
+_metrics = []
+
+
+def _labels(names, values: dict) -> tuple:
+    return tuple(str(values.get(name, "")) for name in names)
+
+
+def _fmt_labels(names, key, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        _metrics.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(self.labelnames, labels), 0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(_Metric):
+    """Значення, що задається напряму або читається функцією в момент запиту."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), func=None):
+        super().__init__(name, help, labels)
+        self._values = {}
+        self._func = func
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_labels(self.labelnames, labels)] = value
+
+    def set_function(self, func) -> None:
+        self._func = func
+
+    def _samples(self):
+        if self._func is not None:
+            try:
+                yield f"{self.name} {self._func()}"
+            except Exception as e:
+                log.debug("gauge %s failed: %s", self.name, e)
+            return
+        for key, value in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [лічильники кошиків..., +Inf, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(self.labelnames, labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        for key, row in self._values.items():
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row):
+                total += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {total}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {row[-1]}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, key)} {total}"
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── HTTP-сервер /metrics ─────────────────────
+_runner = None
+
+
+async def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> None:
+    global _runner
+    if not port or _runner is not None:
+        return
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        # Напр. порт уже зайняв інший процес на цій машині — метрики не варті падіння бота
+        log.warning("⚠️ /metrics не запущено на %s:%s: %s", host, port, e)
+        await runner.cleanup()
+        return
+    _runner = runner
+    log.info("📈 Метрики на http://%s:%s/metrics", host, port)
+
+
+async def stop_metrics_server() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
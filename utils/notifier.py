@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+
+from telegram import Bot
+from telegram.error import (
+    RetryAfter, NetworkError, TelegramError, BadRequest, Forbidden, ChatMigrated, InvalidToken,
+)
+
+from data_manager import outbox_add, outbox_done, renew_outbox, claim_outbox
+from utils.metrics import Counter, Gauge, Histogram
+from utils.token_bucket import TokenBucket
+
+# Канал, куди пишемо сповіщення
+ALERT_CHAT_ID = int(os.getenv("ALERT_CHAT_ID", "-1002506895973"))
+
+# Ліміти Telegram: ~30 повідомлень/с на бота, ~20/хв в одну групу чи канал
+GLOBAL_RPS     = float(os.getenv("TG_GLOBAL_RPS", "25"))
+CHAT_INTERVAL  = float(os.getenv("TG_CHAT_INTERVAL", "3"))
+WORKERS        = int(os.getenv("TG_WORKERS", "2"))
+# Скільки чекаємо перед відправкою, щоб сплеск трансферів зібрався в одне повідомлення
+COALESCE_DELAY = float(os.getenv("TG_COALESCE_DELAY", "1"))
+MAX_BATCH      = 15
+SEND_RETRIES   = 5
+# Пачка, що не пройшла після SEND_RETRIES спроб, повертається в чергу через RETRY_LATER секунд
+RETRY_LATER    = float(os.getenv("TG_RETRY_LATER", "60"))
+# Оренда рядків outbox: продовжується щочверті, прострочені забирає інший процес
+OUTBOX_LEASE   = float(os.getenv("TG_OUTBOX_LEASE", "120"))
+
+log = logging.getLogger(__name__)
+
+ALERTS_ENQUEUED  = Counter("alerts_enqueued_total", "Трансфери, поставлені в чергу сповіщень")
+ALERTS_DEDUPED   = Counter("alerts_deduplicated_total", "Повтори того ж трансферу від інших підписників")
+ALERTS_SENT      = Counter("alerts_sent_total", "Надіслані повідомлення і трансфери в них", ("unit",))
+ALERTS_DROPPED   = Counter("alerts_dropped_total", "Трансфери, які Telegram відхилив остаточно")
+ALERTS_DEFERRED  = Counter("alerts_deferred_total", "Трансфери, відкладені після вичерпання спроб")
+ALERTS_RECLAIMED = Counter("alerts_reclaimed_total", "Недоставлені сповіщення, підхоплені з outbox")
+ALERTS_LIMITED   = Counter("alerts_rate_limited_total", "Відповіді Telegram RetryAfter (flood control)")
+ALERTS_SLOT_WAIT = Histogram("alerts_slot_wait_seconds", "Очікування слота відправки (ліміти чату і глобальний)")
+QUEUE_DEPTH      = Gauge("alerts_queue_depth", "Трансфери, що чекають відправки")
+
+
+class Notifier:
+    """Черга вихідних сповіщень, незалежна від опитування.
+
+    Сповіщення групуються за (chat_id, contract, token name): поки ключ чекає на
+    слот відправки, нові трансфери того ж токена додаються в ту саму пачку і
+    йдуть одним повідомленням.
+
+    Кожне сповіщення до доставки лежить і в outbox у базі (записується разом
+    із seen), тож після збою чи зупинки з непорожньою чергою його дошле цей
+    або інший процес. Зникає воно лише після успішної відправки або
+    остаточної відмови Telegram (BadRequest, Forbidden тощо).
+    """
+
+    def __init__(self, bot: Bot, workers: int = WORKERS, owner: str | None = None):
+        self.bot = bot
+        self.owner = owner or os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self._workers_count = workers
+        self._pending = {}            # key -> [alert, ...]
+        self._ready = asyncio.Queue()  # ключі, що чекають відправки
+        self._chat_next = {}          # chat_id -> найближчий дозволений час відправки
+        self._paused_until = 0.0      # глобальна пауза після RetryAfter
+        self._bucket = TokenBucket(GLOBAL_RPS)
+        self._workers = []
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self):
+        # Свої рядки з попереднього запуску (той самий WORKER_ID) — до першого enqueue
+        self._reclaim(claim_outbox(self.owner, OUTBOX_LEASE, own=True))
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+        self._workers.append(asyncio.create_task(self._outbox_loop()))
+
+    async def stop(self, timeout: float = 10):
+        # Даємо дописати чергу, потім зупиняємо воркерів
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout)
+        except asyncio.TimeoutError:
+            # Вони лишаються в outbox і будуть дослані після перезапуску
+            log.warning("⚠️ Notifier зупинено з %d недоставленими сповіщеннями", self.depth())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def depth(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+    def enqueue(self, token_name: str, contract: str, tx_hash: str, quantity, chat_id: int = ALERT_CHAT_ID):
+        key = (chat_id, contract.lower(), token_name)
+        if not self._add(key, tx_hash, quantity):
+            ALERTS_DEDUPED.inc()
+            return  # той самий трансфер від іншого підписника
+        outbox_add(self.owner, *key, tx_hash, quantity, OUTBOX_LEASE)
+        ALERTS_ENQUEUED.inc()
+
+    def _add(self, key, tx_hash: str, quantity) -> bool:
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            self._ready.put_nowait(key)
+        if any(a["hash"] == tx_hash for a in batch):
+            return False
+        batch.append({"hash": tx_hash, "quantity": quantity})
+        return True
+
+    def _requeue(self, key, batch) -> None:
+        for alert in batch:
+            self._add(key, alert["hash"], alert["quantity"])
+
+    def _reclaim(self, rows) -> None:
+        for row in rows:
+            key = (row["chat_id"], row["contract"], row["token_name"])
+            self._add(key, row["tx_hash"], row["quantity"])
+        if rows:
+            ALERTS_RECLAIMED.inc(len(rows))
+            log.info("📬 Підхоплено %d недоставлених сповіщень з outbox", len(rows))
+
+    async def _outbox_loop(self):
+        """Продовжує оренду своїх рядків outbox і підхоплює покинуті іншими процесами."""
+        while True:
+            await asyncio.sleep(OUTBOX_LEASE / 4)
+            try:
+                renew_outbox(self.owner, OUTBOX_LEASE)
+                self._reclaim(claim_outbox(self.owner, OUTBOX_LEASE))
+            except Exception as e:
+                log.exception("⚠️ Notifier: помилка outbox: %s", e)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            try:
+                await self._deliver(key)
+            except Exception as e:
+                log.exception("⚠️ Notifier: помилка доставки %s: %s", key, e)
+            finally:
+                self._ready.task_done()
+
+    async def _wait_slot(self, chat_id):
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            wait = max(self._paused_until, self._chat_next.get(chat_id, 0.0)) - now
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        # Резервуємо слот до першого await, щоб інші воркери бачили його зайнятим
+        self._chat_next[chat_id] = time.monotonic() + CHAT_INTERVAL
+        await self._bucket.acquire()
+        ALERTS_SLOT_WAIT.observe(time.monotonic() - started)
+
+    async def _deliver(self, key):
+        chat_id, _, token_name = key
+        await asyncio.sleep(COALESCE_DELAY)
+        await self._wait_slot(chat_id)
+
+        batch = self._pending.pop(key, [])
+        if len(batch) > MAX_BATCH:
+            self._pending[key] = batch[MAX_BATCH:]
+            self._ready.put_nowait(key)
+            batch = batch[:MAX_BATCH]
+        if not batch:
+            return
+
+        text = _format(token_name, batch)
+        keys = [(*key, alert["hash"]) for alert in batch]
+        for attempt in range(SEND_RETRIES + 1):
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True
+                )
+                self.sent += 1
+                ALERTS_SENT.inc(unit="messages")
+                ALERTS_SENT.inc(len(batch), unit="transfers")
+                outbox_done(keys)
+                return
+            except RetryAfter as e:
+                # Flood control: Telegram сам каже, скільки чекати
+                delay = e.retry_after
+                if hasattr(delay, "total_seconds"):  # у новіших PTB це timedelta
+                    delay = delay.total_seconds()
+                self._paused_until = time.monotonic() + float(delay)
+                ALERTS_LIMITED.inc()
+                log.warning("⚠️ Telegram RetryAfter %s с для %s", e.retry_after, key)
+                await self._wait_slot(chat_id)
+            except (BadRequest, Forbidden, ChatMigrated, InvalidToken) as e:
+                # Повтор не допоможе. BadRequest у PTB — підклас NetworkError,
+                # тому ця гілка має стояти перед нею
+                log.error("❌ Telegram відхилив сповіщення %s: %s", key, e)
+                self.dropped += len(batch)
+                ALERTS_DROPPED.inc(len(batch))
+                outbox_done(keys)
+                return
+            except NetworkError as e:
+                # TimedOut та інші мережеві збої; повтор теж іде через ліміти чату і бота
+                log.warning("⚠️ Telegram мережева помилка (%s), спроба %d", e, attempt + 1)
+                await asyncio.sleep(random.uniform(0, min(30, 2 ** attempt)))
+                await self._wait_slot(chat_id)
+            except TelegramError as e:
+                # Conflict тощо — невідома відмова, повтор не допоможе
+                log.error("❌ Telegram відхилив сповіщення %s: %s", key, e)
+                self.dropped += len(batch)
+                ALERTS_DROPPED.inc(len(batch))
+                outbox_done(keys)
+                return
+        # Спроби вичерпано (мережа, flood control): пачка лишається в outbox і
+        # повертається в чергу пізніше
+        ALERTS_DEFERRED.inc(len(batch))
+        log.warning("⚠️ Сповіщення %s відкладено на %.0f с (%d транзакцій)", key, RETRY_LATER, len(batch))
+        asyncio.get_running_loop().call_later(RETRY_LATER, self._requeue, key, batch)
+
+
+def _tx_link(tx_hash: str) -> str:
+    return f'<a href="https://bscscan.com/tx/{tx_hash}">Tx hash: …{tx_hash[-7:]}</a>'
+
+
+def _format(token_name: str, batch: list) -> str:
+    if len(batch) == 1:
+        alert = batch[0]
+        return (
+            f"🔔 Транзакція токену {token_name}:\n"
+            f"📥 Кількість: {alert['quantity']}\n"
+            f"{_tx_link(alert['hash'])}"
+        )
+    lines = [f"🔔 Транзакції токену {token_name} ({len(batch)}):"]
+    for alert in batch:
+        lines.append(f"📥 {alert['quantity']} — {_tx_link(alert['hash'])}")
+    return "\n".join(lines)
+
+
+_notifier = None
+QUEUE_DEPTH.set_function(lambda: _notifier.depth() if _notifier is not None else 0)
+
+
+def start_notifier(bot: Bot, owner: str | None = None) -> Notifier:
+    global _notifier
+    if _notifier is None:
+        _notifier = Notifier(bot, owner=owner)
+        _notifier.start()
+    return _notifier
+
+
+async def stop_notifier() -> None:
+    global _notifier
+    if _notifier is not None:
+        await _notifier.stop()
+        _notifier = None
+
+
+def get_notifier() -> Notifier:
+    if _notifier is None:
+        raise RuntimeError("Notifier не запущено: виклич start_notifier()")
+    return _notifier
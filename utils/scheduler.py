@@ -1,99 +1,397 @@
 import asyncio
+import heapq
+import itertools
+import logging
 import os
 import time
-from collections import defaultdict, deque
 
-from aiohttp import ClientSession
-from telegram import Bot
+# 🔄 Імпортуємо централізовані функції сховища на Render Persistent Disk
+from data_manager import (
+    load_data, get_user, load_seen, load_cursors, record_seen, set_cursor, prune_cursors, on_change,
+    subscriptions_changed, flush, flush_if_due,
+)
+from utils.ingestion import make_source
+from utils.metrics import Counter, Gauge, Histogram
+from utils.notifier import get_notifier
+from utils.sharding import SHARD_REFRESH
+from utils.subscriptions import SubscriptionIndex
+from utils.token_meta import cached_decimals, remember_from_transfer
 
-# 🔄 Імпортуємо централізовані функції, що пишуть у /data/data.json на Render Persistent Disk
-from data_manager import load_data, save_data
+log = logging.getLogger(__name__)
+
+CYCLE_SECONDS = Histogram("scheduler_cycle_seconds", "Тривалість циклу опитування (sweep — усі пари, blocks — діапазон блоків)", ("kind",))
+POLL_SECONDS  = Histogram("scheduler_pair_poll_seconds", "Тривалість опитування однієї пари")
+POLLS         = Counter("scheduler_polls_total", "Опитування пар за результатом", ("result",))
+MATCHED       = Counter("scheduler_matched_total", "Трансфери, що пройшли фільтри підписників")
+PAIRS_ACTIVE  = Gauge("scheduler_pairs", "Пари в плані опитування цього процесу")
+IN_FLIGHT     = Gauge("scheduler_in_flight", "Пари, що опитуються зараз")
+POLL_LAG      = Histogram("scheduler_poll_lag_seconds", "Запізнення опитування відносно запланованого часу")
+
+# Вже надіслані хеші по користувачах; живуть між циклами, з бази читаються один раз
+_seen = {}
+
+# Адаптивний інтервал опитування пари: активні — якнайчастіше, неактивні — рідше
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "300"))
+POLL_BACKOFF      = 2.0
+# Як часто повністю перечитувати підписки зі сховища. Зміни з хендлерів цього
+# процесу потрапляють в індекс одразу, тож це лише підстраховка
+PLAN_REFRESH = float(os.getenv("PLAN_REFRESH_INTERVAL", "60"))
+# Як часто перевіряти лічильник змін підписок (зміни з інших процесів)
+GENERATION_CHECK = float(os.getenv("GENERATION_CHECK_INTERVAL", "2"))
+# Курсор джерела за діапазоном блоків — один на всі пари
+RPC_ADDRESS, RPC_CONTRACT = "rpc", "logs"
+RPC_CURSOR_KEY = f"{RPC_ADDRESS}:{RPC_CONTRACT}"
+
+# Джерело трансферів живе весь час роботи, щоб ліміти запитів були спільні
+_source = None
+
+
+def get_source():
+    global _source
+    if _source is None:
+        _source = make_source()
+    return _source
+
+
+# Підписки, згруповані за унікальною парою (address, contract), щоб кожну
+# пару запитувати у джерела один раз; оновлюється інкрементально
+_index = None
+
+
+def get_index() -> SubscriptionIndex:
+    global _index
+    if _index is None:
+        _index = SubscriptionIndex()
+        _index.rebuild(load_data())
+        on_change(lambda user_id: _index.update_user(user_id, get_user(user_id)))
+    return _index
+
+
+def _seen_for(user_id):
+    seen = _seen.get(user_id)
+    if seen is None:
+        seen = _seen[user_id] = load_seen(user_id)
+    return seen
+
+
+def _dispatch(notifier, index, pair, transfers) -> int:
+    """Проганяє трансфери пари через інтервали всіх її підписників."""
+    address, contract = pair
+    # Decimals контракту беремо з кешу метаданих один раз на пару, а не з кожного трансферу
+    decimals = cached_decimals(contract)
+    new_hashes = {}  # user_id -> [tx_hash, ...]
+    try:
+        for tx in transfers:
+            if tx["from"].lower() != address:
+                continue
+            if decimals is None:
+                remember_from_transfer(tx)
+                decimals = int(tx["tokenDecimal"])
+            value = int(tx["value"])
+            tx_hash = tx["hash"]
+            quantity = None
+            for sub in index.match(pair, value, decimals):
+                seen = _seen_for(sub.user_id)
+                if tx_hash in seen:
+                    continue
+                if quantity is None:
+                    quantity = value / (10 ** decimals)
+                # Відправка і ліміти Telegram — справа Notifier, опитування не чекає
+                notifier.enqueue(sub.name, sub.contract, tx_hash, quantity)
+                seen.add(tx_hash)
+                new_hashes.setdefault(sub.user_id, []).append(tx_hash)
+    finally:
+        # Зберігаємо вже поставлене в чергу навіть якщо на півдорозі сталася помилка
+        for user_id, hashes in new_hashes.items():
+            record_seen(user_id, hashes)
+    matched = sum(len(hashes) for hashes in new_hashes.values())
+    MATCHED.inc(matched)
+    return matched
+
+
+async def _check_pair(source, notifier, index, pair, cursors) -> int | None:
+    """Опитує пару; повертає кількість нових сповіщень або None при помилці API."""
+    address, contract = pair
+    cursor_key = f"{address}:{contract}"
+    subs = index.subscribers(pair)
+
+    def known(tx_hash) -> bool:
+        # Трансфер уже у seen кожного підписника — старіші теж оброблено
+        return bool(subs) and all(tx_hash in _seen_for(sub.user_id) for sub in subs)
+
+    started = time.perf_counter()
+    try:
+        transfers, new_cursor = await source.fetch(pair, cursors.get(cursor_key), known)
+    except Exception as e:
+        POLLS.inc(result="api_error")
+        log.warning("⚠️ Помилка при запиті до API: %s", e)
+        return None
+    finally:
+        POLL_SECONDS.observe(time.perf_counter() - started)
+
+    # Один запит — усі підписники цієї пари
+    try:
+        matched = _dispatch(notifier, index, pair, transfers)
+    except Exception as e:
+        # Курсор не рухаємо: наступне опитування повторить спробу
+        POLLS.inc(result="error")
+        log.exception("⚠️ Помилка при обробці %s: %s", pair, e)
+        return None
+    POLLS.inc(result="matched" if matched else "empty")
+
+    if new_cursor is not None and new_cursor != cursors.get(cursor_key):
+        set_cursor(address, contract, new_cursor)
+        cursors[cursor_key] = new_cursor
+    return matched
+
+
+def _forget(index, pairs) -> None:
+    """Пари переїхали від іншого воркера: його seen у нашій пам'яті застарів."""
+    for pair in pairs:
+        for sub in index.subscribers(pair):
+            _seen.pop(sub.user_id, None)
+
+
+def _refresh(index, full: bool = True) -> dict:
+    """Перечитує підписки (за потреби) і курсори; курсори пар без підписників відкидаються."""
+    if full:
+        index.rebuild(load_data())
+    # При повторній підписці не треба надсилати всю історію з моменту старого курсора
+    active = [f"{address}:{contract}" for address, contract in index.pairs()]
+    prune_cursors(active + [RPC_CURSOR_KEY])
+    return load_cursors()
 
-# Обмеження: не більше 10 повідомлень на токен за останню хвилину
-_rate_limit = defaultdict(deque)  # ключ: (user_id, token_contract), значення: deque(times)
 
 async def check_wallets(app):
-    bot: Bot = app.bot
-    api_key = os.getenv("BSCSCAN_API_KEY")
-    data = load_data()
-
-    async with ClientSession() as session:
-        for user_id, user_info in data.items():
-            for wallet in user_info.get("wallets", []):
-                address = wallet["address"]
-                for token in user_info.get("tokens", []):
-                    if token["wallet_name"] != wallet["name"]:
-                        continue
-
-                    url = (
-                        f"https://api.bscscan.com/api"
-                        f"?module=account"
-                        f"&action=tokentx"
-                        f"&address={address}"
-                        f"&contractaddress={token['contract']}"
-                        f"&sort=desc"
-                        f"&apikey={api_key}"
-                    )
-
-                    try:
-                        async with session.get(url) as resp:
-                            res = await resp.json()
-                            if res.get("status") != "1":
-                                continue
-
-                            # Охоплення останніх 50 транзакцій
-                            for tx in res["result"][:50]:
-                                if tx["from"].lower() != address.lower():
-                                    continue
-
-                                quantity = int(tx["value"]) / (10 ** int(tx["tokenDecimal"]))
-                                if not (float(token["min"]) <= quantity <= float(token["max"])):
-                                    continue
-
-                                tx_hash = tx["hash"]
-                                seen = user_info.setdefault("seen", [])
-                                if tx_hash in seen:
-                                    continue
-
-                                key = (user_id, token["contract"])
-                                now = time.time()
-                                dq = _rate_limit[key]
-                                while dq and now - dq[0] > 60:
-                                    dq.popleft()
-                                if len(dq) >= 10:
-                                    print(f"⚠️ Rate limit reached for {key}, skipping message")
-                                    continue
-
-                                short_hash = tx_hash[-7:]
-                                display = f"…{short_hash}"
-                                message = (
-                                    f"🔔 Транзакція токену {token['name']}:\n"
-                                    f"📥 Кількість: {quantity}\n"
-                                    f'<a href="https://bscscan.com/tx/{tx_hash}">Tx hash: {display}</a>'
-                                )
-                                await bot.send_message(
-                                    chat_id=-1002506895973,  # 🔄 канал, куди пишемо
-                                    text=message,
-                                    parse_mode="HTML",
-                                    disable_web_page_preview=True
-                                )
-
-                                seen.append(tx_hash)
-                                dq.append(now)
-
-                                if len(seen) > 1000:
-                                    user_info["seen"] = seen[-1000:]
-
-                    except Exception as e:
-                        print(f"⚠️ Помилка при запиті до API: {e}")
-
-    save_data(data)
-
-
-async def start_scheduler(app):
+    source = get_source()
+    notifier = get_notifier()
+    index = get_index()
+    cursors = _refresh(index)
+
+    try:
+        if not source.per_pair:
+            await _ingest_blocks(source, notifier, index, cursors)
+            return
+
+        # Помилки ізольовані всередині _check_pair, тож gather не обривається
+        with CYCLE_SECONDS.time(kind="sweep"):
+            await asyncio.gather(*(
+                _check_pair(source, notifier, index, pair, cursors)
+                for pair in list(index.pairs())
+            ))
+    finally:
+        # Усі seen і курсори циклу — одним записом
+        flush()
+
+
+async def _ingest_blocks(source, notifier, index, cursors) -> int:
+    """Один прохід джерела за діапазоном блоків: від курсора до голови ланцюга."""
+    with CYCLE_SECONDS.time(kind="blocks"):
+        head = await source.head()
+        cursor = cursors.get(RPC_CURSOR_KEY)
+        # Без курсора починаємо з поточної голови, а не з усієї історії
+        start = cursor["block"] + 1 if cursor else head
+        matched = 0
+        while start <= head:
+            end = min(head, start + source.max_block_range - 1)
+            routed = await source.fetch_range(list(index.pairs()), start, end)
+            for pair, transfers in routed.items():
+                matched += _dispatch(notifier, index, pair, transfers)
+            cursors[RPC_CURSOR_KEY] = {"block": end, "hash": None}
+            set_cursor(RPC_ADDRESS, RPC_CONTRACT, cursors[RPC_CURSOR_KEY])
+            start = end + 1
+    return matched
+
+
+class PollQueue:
+    """Купа пар (address, contract), впорядкована за часом наступного опитування.
+
+    Після опитування з новими сповіщеннями інтервал пари скидається до
+    POLL_MIN_INTERVAL, після порожнього — подвоюється до POLL_MAX_INTERVAL.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._heap = []                # (due, seq, pair)
+        self._live = {}                # pair -> seq єдиного чинного запису в купі
+        self._intervals = {}           # pair -> поточний інтервал
+        self._active = set()
+        self._in_flight = set()
+        self._seq = itertools.count()  # щоб купа не порівнювала самі пари
+        self.changed = asyncio.Event()
+
+    def sync(self, pairs) -> None:
+        """Додає нові пари (одразу до опитування), видалені відкидає ліниво."""
+        pairs = set(pairs)
+        now = time.monotonic()
+        for pair in pairs - self._active:
+            self._intervals[pair] = self.min_interval
+            if pair not in self._in_flight:
+                self._push(now, pair)
+        for pair in self._active - pairs:
+            self._intervals.pop(pair, None)
+            # Запис у купі лишається, але стає застарілим і буде пропущений
+            self._live.pop(pair, None)
+        self._active = pairs
+
+    def _push(self, due: float, pair) -> None:
+        seq = next(self._seq)
+        self._live[pair] = seq
+        heapq.heappush(self._heap, (due, seq, pair))
+        self.changed.set()
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            when, _, pair = heapq.heappop(self._heap)
+            del self._live[pair]
+            self._in_flight.add(pair)
+            due.append(pair)
+            POLL_LAG.observe(now - when)
+            self._drop_stale()
+        return due
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    @property
+    def in_flight(self) -> set:
+        return self._in_flight
+
+    def next_due(self) -> float | None:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def reschedule(self, pair, matched: int | None) -> None:
+        self._in_flight.discard(pair)
+        if pair not in self._active:
+            return
+        interval = self._intervals.get(pair, self.min_interval)
+        if matched:
+            interval = self.min_interval
+        else:
+            interval = min(interval * POLL_BACKOFF, self.max_interval)
+        self._intervals[pair] = interval
+        self._push(time.monotonic() + interval, pair)
+
+
+async def _poll(queue, source, notifier, index, pair, cursors):
+    matched = None
+    try:
+        matched = await _check_pair(source, notifier, index, pair, cursors)
+    finally:
+        queue.reschedule(pair, matched)
+
+
+async def _run_block_source(source, notifier, index, shard=None):
+    next_refresh = 0.0
+    generation = None
+    rpc_pair = (RPC_ADDRESS, RPC_CONTRACT)
     while True:
         try:
-            await check_wallets(app)
+            now = time.monotonic()
+            # Власні зміни хендлерів індекс уже застосував через on_change
+            generation, foreign = subscriptions_changed(generation)
+            full = now >= next_refresh or foreign
+            cursors = _refresh(index, full=full)
+            if full:
+                next_refresh = now + PLAN_REFRESH
+            # Джерело за блоками одне на всіх: його тримає один воркер (оренда курсора)
+            if shard is not None:
+                if shard.refresh([rpc_pair]):
+                    _seen.clear()
+                if rpc_pair not in shard.owned:
+                    await asyncio.sleep(SHARD_REFRESH)
+                    continue
+            PAIRS_ACTIVE.set(len(index.pairs()))
+            await _ingest_blocks(source, notifier, index, cursors)
+            flush_if_due()
         except Exception as e:
-            print(f"❌ Scheduler error: {e}")
-        await asyncio.sleep(5)
+            log.exception("❌ Scheduler error (%s): %s", source.name, e)
+        await asyncio.sleep(source.poll_interval)
+
+
+async def start_scheduler(app, shard=None):
+    """Основний цикл опитування.
+
+    shard — utils.sharding.Shard, якщо воркерів кілька: тоді опитуються лише
+    пари, орендовані цим воркером.
+    """
+    source = get_source()
+    notifier = get_notifier()
+    index = get_index()
+    if not source.per_pair:
+        return await _run_block_source(source, notifier, index, shard)
+
+    queue = PollQueue()
+    cursors = {}
+    tasks = set()
+    next_refresh = next_generation = next_shard = 0.0
+    generation = None
+    synced_version = None
+
+    while True:
+        try:
+            now = time.monotonic()
+            if now >= next_generation:
+                # Зміни з інших процесів (напр. webhook окремо від воркера);
+                # власні зміни хендлерів індекс уже застосував через on_change
+                generation, foreign = subscriptions_changed(generation)
+                if foreign:
+                    next_refresh = now
+                next_generation = now + GENERATION_CHECK
+            if now >= next_refresh:
+                cursors = _refresh(index)
+                next_refresh = now + PLAN_REFRESH
+            if shard is not None and now >= next_shard:
+                gained = shard.refresh(index.pairs(), busy=queue.in_flight)
+                if gained:
+                    _forget(index, gained)
+                    cursors.update(load_cursors())
+                next_shard = now + SHARD_REFRESH
+            # Індекс міг змінитись з хендлерів — нові пари опитуємо одразу
+            version = (index.version, shard.version if shard else 0)
+            if version != synced_version:
+                pairs = index.pairs()
+                if shard is not None:
+                    pairs = [pair for pair in pairs if pair in shard.owned]
+                queue.sync(pairs)
+                synced_version = version
+
+            for pair in queue.pop_due(now):
+                task = asyncio.create_task(
+                    _poll(queue, source, notifier, index, pair, cursors)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            PAIRS_ACTIVE.set(len(queue))
+            IN_FLIGHT.set(len(tasks))
+            # Зміни seen/курсорів від опитувань накопичуються і пишуться пачкою
+            flush_if_due()
+        except Exception as e:
+            log.exception("❌ Scheduler error: %s", e)
+            # Відкладаємо всі періодичні кроки, інакше збій, що повторюється, крутить цикл без пауз
+            now = time.monotonic()
+            next_refresh = now + PLAN_REFRESH
+            next_generation = max(next_generation, now + GENERATION_CHECK)
+            next_shard = max(next_shard, now + SHARD_REFRESH)
+
+        # Спимо до найближчої події: черговий due, оновлення плану або перепланування
+        wake = min(next_refresh, next_generation)
+        if shard is not None:
+            wake = min(wake, next_shard)
+        next_due = queue.next_due()
+        if next_due is not None:
+            wake = min(wake, next_due)
+        queue.changed.clear()
+        try:
+            await asyncio.wait_for(queue.changed.wait(), max(0.0, wake - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
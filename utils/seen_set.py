@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+HASH_SIZE = 32  # tx hash у BSC — 32 байти
+
+
+def _to_bytes(tx_hash) -> bytes:
+    if isinstance(tx_hash, bytes):
+        return tx_hash
+    if tx_hash.startswith(("0x", "0X")):
+        tx_hash = tx_hash[2:]
+    raw = bytes.fromhex(tx_hash)
+    if len(raw) != HASH_SIZE:
+        raise ValueError(f"Очікувався {HASH_SIZE}-байтовий хеш, отримано {len(raw)}")
+    return raw
+
+
+class SeenSet:
+    """Множина хешів транзакцій з фіксованою місткістю.
+
+    Перевірка й додавання — O(1), при переповненні витісняються найстаріші
+    хеші. Зберігається компактно: сирі 32-байтові хеші підряд.
+    """
+
+    def __init__(self, capacity: int = 1000, hashes=()):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        for h in hashes:
+            self.add(h)
+
+    def __contains__(self, tx_hash) -> bool:
+        try:
+            return _to_bytes(tx_hash) in self._items
+        except ValueError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, tx_hash) -> bool:
+        """Додає хеш; повертає False, якщо він уже був."""
+        key = _to_bytes(tx_hash)
+        if key in self._items:
+            return False
+        self._items[key] = None
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+        return True
+
+    def update(self, hashes) -> None:
+        for h in hashes:
+            self.add(h)
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self._items)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, capacity: int = 1000) -> "SeenSet":
+        return cls(capacity, (blob[i:i + HASH_SIZE] for i in range(0, len(blob), HASH_SIZE)))
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import socket
+from bisect import bisect_right
+
+from data_manager import heartbeat_worker, remove_worker, acquire_leases, release_leases
+
+# Оренда пари живе LEASE_TTL секунд і продовжується кожні SHARD_REFRESH секунд
+LEASE_TTL     = float(os.getenv("SHARD_LEASE_TTL", "30"))
+SHARD_REFRESH = float(os.getenv("SHARD_REFRESH_INTERVAL", "10"))
+VNODES        = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing: при зміні складу воркерів переїжджає лише ~1/N пар."""
+
+    def __init__(self, nodes, vnodes: int = VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> str | None:
+        if not self._nodes:
+            return None
+        i = bisect_right(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+class Shard:
+    """Частка пар (address, contract), яку опитує цей воркер.
+
+    refresh() оновлює серцебиття, будує кільце з живих воркерів і бере в
+    оренду свої пари; пари, що переїхали до іншого воркера, звільняються —
+    але не раніше, ніж завершиться їхнє поточне опитування.
+    """
+
+    def __init__(self, worker_id: str | None = None, lease_ttl: float = LEASE_TTL):
+        self.worker_id = worker_id or os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.owned = set()
+        self.draining = set()  # пари вже не наші, але їхнє опитування ще триває
+        self.version = 0
+
+    def refresh(self, pairs, busy=()) -> set:
+        """Повертає пари, щойно отримані від інших воркерів.
+
+        busy — пари, що зараз опитуються. Якщо така пара переїхала, оренду
+        тримаємо до кінця опитування: інакше новий власник почне з того ж
+        курсора паралельно і надішле ті самі сповіщення вдруге.
+        """
+        ring = HashRing(heartbeat_worker(self.worker_id, self.lease_ttl))
+        mine = {pair for pair in pairs if ring.owner(f"{pair[0]}:{pair[1]}") == self.worker_id}
+        held = self.owned | self.draining
+        draining = (held - mine) & set(busy)
+        lost = held - mine - draining
+        if lost:
+            release_leases(self.worker_id, lost)
+        # Пари, ще орендовані попереднім власником, дістануться нам після спливу його оренди
+        acquired = acquire_leases(self.worker_id, mine | draining, self.lease_ttl)
+        self.draining = acquired & draining
+        acquired -= draining
+        gained = acquired - self.owned
+        if acquired != self.owned:
+            self.owned = acquired
+            self.version += 1
+        return gained
+
+    def close(self) -> None:
+        remove_worker(self.worker_id)
+        self.owned = set()
+        self.draining = set()
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+import data_manager
+
+# Бекенд стану діалогів: memory (один процес), sqlite (спільна база) або redis
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+# Через скільки секунд бездіяльності діалог забувається
+STATE_TTL = float(os.getenv("STATE_TTL", "1800"))
+STATE_MAX_USERS = int(os.getenv("STATE_MAX_USERS", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class StateStore:
+    """Стан діалогу на користувача з TTL.
+
+    Стан — словник з полями "owner" (хендлер, що веде діалог: "wallet" або
+    "token") і "step". Ключі завжди приводяться до str(user_id). Після зміни
+    стану його треба зберегти через set(): бекенди тримають копії.
+    """
+
+    def __init__(self, ttl: float = STATE_TTL):
+        self.ttl = ttl
+
+    def get(self, user_id) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, user_id, state: dict) -> None:
+        raise NotImplementedError
+
+    def pop(self, user_id) -> None:
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    """LRU у пам'яті: найдавніші діалоги витісняються понад max_users."""
+
+    def __init__(self, ttl: float = STATE_TTL, max_users: int = STATE_MAX_USERS):
+        super().__init__(ttl)
+        self.max_users = max_users
+        self._items = OrderedDict()  # user_id -> (expires, state json)
+
+    def get(self, user_id):
+        key = str(user_id)
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, raw = item
+        if expires < time.monotonic():
+            del self._items[key]
+            return None
+        return json.loads(raw)
+
+    def set(self, user_id, state):
+        key = str(user_id)
+        self._items[key] = (time.monotonic() + self.ttl, json.dumps(state))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_users:
+            self._items.popitem(last=False)
+
+    def pop(self, user_id):
+        self._items.pop(str(user_id), None)
+
+
+class SqliteStateStore(StateStore):
+    """Стан у спільній базі: переживає рестарт і видимий усім webhook-процесам."""
+
+    # Прострочені рядки прибираються раз на стільки записів
+    PURGE_EVERY = 100
+
+    def __init__(self, ttl: float = STATE_TTL):
+        super().__init__(ttl)
+        self._writes = 0
+
+    def get(self, user_id):
+        return data_manager.get_conv_state(user_id)
+
+    def set(self, user_id, state):
+        data_manager.set_conv_state(user_id, state, self.ttl)
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def pop(self, user_id):
+        data_manager.delete_conv_state(user_id)
+
+    def purge(self):
+        data_manager.purge_conv_states()
+
+
+class RedisStateStore(StateStore):
+    """Redis (або сумісний локальний сервер); потребує пакет redis."""
+
+    def __init__(self, ttl: float = STATE_TTL, url: str = REDIS_URL):
+        super().__init__(ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND=redis потребує пакет redis (pip install redis)")
+        self._redis = redis.Redis.from_url(url)
+
+    def _key(self, user_id) -> str:
+        return f"conv_state:{user_id}"
+
+    def get(self, user_id):
+        raw = self._redis.get(self._key(user_id))
+        return json.loads(raw) if raw else None
+
+    def set(self, user_id, state):
+        self._redis.set(self._key(user_id), json.dumps(state), ex=int(self.ttl))
+
+    def pop(self, user_id):
+        self._redis.delete(self._key(user_id))
+
+
+_BACKENDS = {
+    "memory": MemoryStateStore,
+    "sqlite": SqliteStateStore,
+    "redis": RedisStateStore,
+}
+
+_store = None
+
+
+def get_state_store() -> StateStore:
+    global _store
+    if _store is None:
+        if STATE_BACKEND not in _BACKENDS:
+            raise ValueError(f"Невідомий STATE_BACKEND={STATE_BACKEND!r}")
+        _store = _BACKENDS[STATE_BACKEND]()
+    return _store
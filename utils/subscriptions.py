@@ -0,0 +1,142 @@
+import logging
+import math
+from bisect import bisect_right
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+
+log = logging.getLogger(__name__)
+
+
+class Subscription:
+    __slots__ = ("user_id", "name", "contract", "min", "max")
+
+    def __init__(self, user_id: str, token: dict):
+        self.user_id = user_id
+        self.name = token["name"]
+        self.contract = token["contract"]
+        # Межі зберігаються рядками — парсимо один раз, без втрат точності float.
+        # "-inf" / "inf" (старі записи, float їх приймав) — відкрита межа: None
+        low = Decimal(str(token["min"]))
+        high = Decimal(str(token["max"]))
+        if low.is_nan() or high.is_nan():
+            raise ValueError(f"межа NaN: {token['min']!r}..{token['max']!r}")
+        if (low.is_infinite() and low > 0) or (high.is_infinite() and high < 0):
+            raise ValueError(f"порожній інтервал: {token['min']!r}..{token['max']!r}")
+        self.min = None if low.is_infinite() else low
+        self.max = None if high.is_infinite() else high
+
+    def units(self, decimals: int) -> tuple[int, float]:
+        """Межі в базових одиницях токена: min <= value / 10**decimals <= max.
+
+        Відкрита верхня межа — math.inf (int порівнюється з нею точно).
+        """
+        scale = Decimal(10) ** decimals
+        low = 0
+        if self.min is not None:
+            low = int((self.min * scale).to_integral_value(rounding=ROUND_CEILING))
+        high = math.inf
+        if self.max is not None:
+            high = int((self.max * scale).to_integral_value(rounding=ROUND_FLOOR))
+        return low, high
+
+
+class _PairIndex:
+    """Підписники однієї пари, відсортовані за нижньою межею."""
+
+    def __init__(self):
+        self.subs = []
+        self._compiled = {}  # decimals -> (mins, [(max, sub), ...])
+
+    def add(self, sub: Subscription):
+        self.subs.append(sub)
+        self._compiled.clear()
+
+    def remove_user(self, user_id: str):
+        self.subs = [s for s in self.subs if s.user_id != user_id]
+        self._compiled.clear()
+
+    def _compile(self, decimals: int):
+        compiled = self._compiled.get(decimals)
+        if compiled is None:
+            ranges = []
+            for i, sub in enumerate(self.subs):
+                try:
+                    ranges.append((*sub.units(decimals), i))
+                except (ArithmeticError, ValueError) as e:
+                    # Одна зіпсована межа не повинна зупиняти сповіщення решти підписників пари
+                    log.warning("Пропускаю підписку %s/%s: %s", sub.user_id, sub.name, e)
+            ranges.sort()
+            mins = [low for low, _, _ in ranges]
+            entries = [(high, self.subs[i]) for _, high, i in ranges]
+            compiled = self._compiled[decimals] = (mins, entries)
+        return compiled
+
+    def match(self, value: int, decimals: int) -> list:
+        mins, entries = self._compile(decimals)
+        # Кандидати — усі з min <= value; з них лишаємо ті, де value <= max
+        return [sub for high, sub in entries[:bisect_right(mins, value)] if value <= high]
+
+
+class SubscriptionIndex:
+    """Підписки, скомпільовані за ключем (from-адреса, контракт) у нижньому регістрі.
+
+    Перевірка трансферу — цілочисельне порівняння в базових одиницях токена
+    проти відсортованих інтервалів усіх підписників пари.
+    """
+
+    def __init__(self):
+        self._pairs = {}    # (address, contract) -> _PairIndex
+        self._by_user = {}  # user_id -> {pair, ...}
+        self.version = 0    # зростає з кожною зміною — щоб споживачі знали, коли пересинхронізуватись
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def __contains__(self, pair) -> bool:
+        return pair in self._pairs
+
+    def pairs(self):
+        return self._pairs.keys()
+
+    def subscribers(self, pair) -> list:
+        index = self._pairs.get(pair)
+        return index.subs if index else []
+
+    def match(self, pair, value: int, decimals: int) -> list:
+        index = self._pairs.get(pair)
+        return index.match(value, decimals) if index else []
+
+    def rebuild(self, data: dict) -> None:
+        self._pairs.clear()
+        self._by_user.clear()
+        self.version += 1
+        for user_id, user_info in data.items():
+            self.update_user(user_id, user_info)
+
+    def update_user(self, user_id, user_info: dict | None) -> None:
+        """Перебудовує лише підписки одного користувача."""
+        user_id = str(user_id)
+        self.version += 1
+        for pair in self._by_user.pop(user_id, ()):
+            index = self._pairs[pair]
+            index.remove_user(user_id)
+            if not index.subs:
+                del self._pairs[pair]
+        if not user_info:
+            return
+
+        pairs = set()
+        for wallet in user_info.get("wallets", []):
+            address = wallet["address"].lower()
+            for token in user_info.get("tokens", []):
+                if token["wallet_name"] != wallet["name"]:
+                    continue
+                try:
+                    sub = Subscription(user_id, token)
+                except (ArithmeticError, ValueError) as e:
+                    log.warning("Пропускаю підписку %s/%s: %s", user_id, token.get("name"), e)
+                    continue
+                pair = (address, token["contract"].lower())
+                self._pairs.setdefault(pair, _PairIndex()).add(sub)
+                pairs.add(pair)
+        if pairs:
+            self._by_user[user_id] = pairs
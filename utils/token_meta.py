@@ -0,0 +1,107 @@
+import os
+import re
+import time
+
+from data_manager import get_token_meta, put_token_meta
+from utils.ingestion import BSC_RPC_URL, rpc_call
+
+# Як довго вважаємо метадані токена свіжими (decimals не змінюються, але symbol/name можуть)
+TOKEN_META_TTL = float(os.getenv("TOKEN_META_TTL", str(7 * 24 * 3600)))
+
+# Селектори ERC-20/BEP-20
+DECIMALS_SELECTOR = "0x313ce567"
+SYMBOL_SELECTOR   = "0x95d89b41"
+NAME_SELECTOR     = "0x06fdde03"
+
+_ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+# contract -> meta; копія рядків token_meta, щоб гаряча частина не ходила в базу
+_cache = {}
+
+
+def normalize_address(text: str) -> str:
+    """Перевіряє формат адреси і повертає її в нижньому регістрі."""
+    text = text.strip()
+    if not _ADDRESS_RE.match(text):
+        raise ValueError(f"Некоректна адреса: {text!r}")
+    return text.lower()
+
+
+def _decode_string(raw: str) -> str | None:
+    """ABI-рядок або bytes32 (старі токени) у str."""
+    data = bytes.fromhex(raw[2:] if raw.startswith("0x") else raw)
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", "replace") or None
+    if len(data) < 64:
+        return None
+    offset = int.from_bytes(data[:32], "big")
+    length = int.from_bytes(data[offset:offset + 32], "big")
+    return data[offset + 32:offset + 32 + length].decode("utf-8", "replace") or None
+
+
+async def _fetch(contract: str, rpc_url: str) -> dict:
+    async def call(selector):
+        return await rpc_call("eth_call", [{"to": contract, "data": selector}, "latest"], rpc_url)
+
+    raw = await call(DECIMALS_SELECTOR)
+    if not raw or raw == "0x":
+        raise ValueError(f"{contract} не відповідає на decimals() — це не токен BEP-20")
+    meta = {"contract": contract, "decimals": int(raw, 16), "symbol": None, "name": None}
+    # symbol/name — необов'язкові за стандартом
+    for field, selector in (("symbol", SYMBOL_SELECTOR), ("name", NAME_SELECTOR)):
+        try:
+            meta[field] = _decode_string(await call(selector))
+        except Exception:
+            pass
+    return meta
+
+
+def _store(meta: dict) -> dict:
+    meta["fetched_at"] = meta.get("fetched_at") or time.time()
+    put_token_meta(meta["contract"], meta["symbol"], meta["name"], meta["decimals"], meta["fetched_at"])
+    _cache[meta["contract"]] = meta
+    return meta
+
+
+def _cached(contract: str) -> dict | None:
+    meta = _cache.get(contract)
+    if meta is None:
+        meta = get_token_meta(contract)
+        if meta is not None:
+            _cache[contract] = meta
+    return meta
+
+
+async def get_meta(contract: str, refresh: bool = False, rpc_url: str = BSC_RPC_URL) -> dict:
+    """Метадані токена: пам'ять → база → RPC. Протухлі за TTL перезапитуються."""
+    contract = normalize_address(contract)
+    meta = None if refresh else _cached(contract)
+    if meta is not None and time.time() - meta["fetched_at"] < TOKEN_META_TTL:
+        return meta
+    try:
+        return _store(await _fetch(contract, rpc_url))
+    except Exception:
+        # Якщо RPC недоступний, краще протухлі дані, ніж жодних
+        if meta is not None:
+            return meta
+        raise
+
+
+def cached_decimals(contract: str) -> int | None:
+    """Decimals без мережі — лише з кешу (пам'ять або база)."""
+    meta = _cached(contract.lower())
+    return meta["decimals"] if meta else None
+
+
+def remember_from_transfer(tx: dict) -> None:
+    """Заповнює кеш із полів відповіді tokentx, якщо контракт ще невідомий."""
+    contract = tx.get("contractAddress", "").lower()
+    if not contract or _cached(contract) is not None:
+        return
+    _store({
+        "contract": contract,
+        "decimals": int(tx["tokenDecimal"]),
+        "symbol": tx.get("tokenSymbol"),
+        "name": tx.get("tokenName"),
+        "fetched_at": None,
+    })
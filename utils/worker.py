@@ -0,0 +1,61 @@
+"""Окремий воркер планувальника: python -m utils.worker
+
+Кілька таких процесів на одній машині ділять пари (address, contract)
+через consistent hashing з орендою в спільній базі, тож кожну пару опитує
+лише один воркер. База — SQLite-файл на локальному диску, тому всі процеси
+мають бути на тому самому інстансі: persistent disk Render підключається
+лише до одного інстансу. Webhook-процес при цьому запускають з
+SCHEDULER_ENABLED=0.
+
+Кожен процес віддає власний /metrics, тому кожному воркеру треба свій
+METRICS_PORT (напр. 9092, 9093, …) або METRICS_PORT=0, щоб не запускати
+сервер метрик. Процес, що не зміг зайняти порт, працює без /metrics.
+"""
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from telegram import Bot
+
+from data_manager import flush
+from utils.http_client import start_http, close_http
+from utils.metrics import start_metrics_server, stop_metrics_server
+from utils.notifier import start_notifier, stop_notifier
+from utils.scheduler import start_scheduler
+from utils.sharding import Shard
+
+
+async def run_worker():
+    load_dotenv()
+    token = os.getenv("TELEGRAM_TOKEN")
+    if not token:
+        raise RuntimeError("❌ TELEGRAM_TOKEN не задано!")
+
+    bot = Bot(token)
+    shard = Shard()
+    logging.info("🔔 Воркер %s запускає scheduler…", shard.worker_id)
+    async with bot:
+        await start_http()
+        try:
+            await start_metrics_server()
+            start_notifier(bot, owner=shard.worker_id)
+            await start_scheduler(None, shard=shard)
+        finally:
+            shard.close()
+            await stop_notifier()
+            # Після зупинки Notifier: доставлене за час зупинки теж прибирається з outbox
+            flush()
+            await close_http()
+            await stop_metrics_server()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    )
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass